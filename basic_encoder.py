@@ -3,6 +3,7 @@ from utils import hour_for_day, day, map_teacher, exactly, at_least, is_first_sl
 from pysat.formula import IDPool
 from pysat.card import CardEnc, ITotalizer
 from utils import parse_xml, decode_solution
+from complete_encode import build_index
 import time 
 
 def encoder(instance: Instance, type_sat:int = 0):
@@ -17,6 +18,7 @@ def encoder(instance: Instance, type_sat:int = 0):
     curricula = instance.curricula
     rooms = instance.rooms
     unavailabilities = instance.unavailabilities
+    index = build_index(instance)
     # Creacion de las variables
     ch, id_to_var = get_ch(courses, total_hours, vpool, id_to_var)
     cd, id_to_var = get_cd(courses, instance.num_days, vpool, id_to_var)
@@ -24,11 +26,11 @@ def encoder(instance: Instance, type_sat:int = 0):
     kh, id_to_var = get_kh(curricula, total_hours, vpool, id_to_var)
     # Creacion de clausulas a partir de relaciones
     hard_clauses.extend(relation_ch_cd(ch, cd, ppd)) 
-    hard_clauses.extend(relation_ch_kh(ch, kh, curricula))
+    hard_clauses.extend(relation_ch_kh(ch, kh, curricula, index))
     # Creacion de clausulas a partir de colisiones
     hard_clauses.extend(curriculum_clashes(ch, curricula))
     hard_clauses.extend(teacher_clashes(courses, ch))
-    hard_clauses.extend(room_clashes(ch, cr, courses, rooms))
+    hard_clauses.extend(room_clashes(ch, cr, courses, rooms, index))
     # Creacion de clausulas por disponibilidad
     hard_clauses.extend(time_slot_availability(ch,unavailabilities, ppd ))
     hard_clauses.extend(number_of_lectures(courses, ch, vpool))
@@ -231,19 +233,25 @@ def  time_slot_availability(ch, unavailabilities, ppd):
         clauses.append([-ch[(course, hour)]])
     return clauses
 
-def room_clashes(ch, cr, courses_dict, rooms_dict):
+def room_clashes(ch, cr, courses_dict, rooms_dict, index):
     clauses = []
-    hours = {h for (c, h) in ch.keys()}
-    all_course_ids = list(courses_dict.keys())
+    hours = sorted({h for (c, h) in ch.keys()})
     all_room_ids = list(rooms_dict.keys())
-    num_courses = len(all_course_ids)
-    for h in hours:
-        for r in all_room_ids:
-            for i in range(num_courses):
-                for j in range(i + 1, num_courses):
-                    c_i = all_course_ids[i]
-                    c_j = all_course_ids[j]
-                    if (c_i, h) in ch and (c_j, h) in ch and (c_i, r) in cr and (c_j, r) in cr:
+    for r in all_room_ids:
+        # Solo los cursos que caben en la sala pueden chocar en ella (room_capacity)
+        capacity = rooms_dict[r].capacity
+        users = [c for c, course in courses_dict.items()
+                 if course.num_students <= capacity and (c, r) in cr]
+        num_users = len(users)
+        for h in hours:
+            for i in range(num_users):
+                c_i = users[i]
+                # En una hora no disponible el curso no se dicta y no puede chocar
+                if (c_i, h) not in ch or h in index.course_unavailable[c_i]:
+                    continue
+                for j in range(i + 1, num_users):
+                    c_j = users[j]
+                    if (c_j, h) in ch and h not in index.course_unavailable[c_j]:
                         id_ch_i = ch[(c_i, h)]
                         id_ch_j = ch[(c_j, h)]
                         id_cr_i = cr[(c_i, r)]
@@ -296,10 +304,10 @@ def curriculum_clashes(ch, curricula):
                         clauses.append(clause)
     return clauses
 
-def relation_ch_kh(ch, kh, curricula):
+def relation_ch_kh(ch, kh, curricula, index):
     clauses = []
     for (c, h) in ch:
-        ks = c_in_k(c, curricula)
+        ks = index.course_curricula.get(c, [])
         lit_ch = -ch[(c, h)]
         for k in ks:
             if (k, h) in kh:
@@ -315,16 +323,6 @@ def relation_ch_kh(ch, kh, curricula):
             clauses.append(clause)
     return clauses
 
-def c_in_k(c, curricula):
-    out = []
-    for k in curricula:
-        curriculum = curricula[k]
-        for course in curriculum.courses:
-            if c == course:
-                out.append(k)
-    return out
-
-
 def relation_ch_cd(ch, cd, ppd):
     """
     Obtiene las clausulas a partir de las relaciones ch y cd
@@ -0,0 +1,193 @@
+"""
+Ejecución en lote de complete_encode.py: cada par (instancia, modo) en su propio proceso
+con timeout y límite de memoria, con los resultados a CSV / JSON Lines.
+
+    python batch_runner.py "data/comp*.ctt" --modes 3,4.1,4.2,4.4 --timeout 300 --jobs 16
+"""
+
+import argparse
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from multiprocessing.connection import wait
+
+from complete_encode import (
+    SECTIONS, CLASH_ENCODINGS, TIMEOUT, EncodingCache,
+    parse_ctt, encode_with_layout, normalize_formula, solve_sat, solve_maxsat_rc2,
+)
+
+FIELDS = ["instance", "mode", "status", "cost", "lower_bound", "encode_time", "solve_time",
+          "variables", "hard_clauses", "soft_clauses", "error"]
+MEMOUT = "MEMOUT"
+ERROR = "ERROR"
+# margen sobre el timeout antes de matar un proceso que no responde
+KILL_GRACE = 30
+
+def run_job(path, mode, timeout, clash_encoding, normalize, memory_mb, cache_dir, conn):
+    """Proceso de trabajo: parsea, codifica (o carga del cache) y resuelve un par (instancia, modo)"""
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    sys.stdout = open(os.devnull, "w")
+
+    row = dict.fromkeys(FIELDS)
+    row.update(instance=os.path.basename(path), mode=mode)
+    start_time = time.time()
+    try:
+        cache = EncodingCache(cache_dir) if cache_dir else None
+        cache_key = cache.key(path, mode, clash_encoding, normalize) if cache else None
+        cached = cache.load(cache_key) if cache else None
+        if cached:
+            hard_clauses, soft_clauses_weighted, vpool, _ = cached
+        else:
+            instance = parse_ctt(path)
+            hard_clauses, soft_clauses_weighted, vpool, layout = encode_with_layout(
+                mode, instance, clash_encoding=clash_encoding)
+            if normalize:
+                hard_clauses, soft_clauses_weighted, _ = normalize_formula(hard_clauses, soft_clauses_weighted)
+            if cache:
+                cache.store(cache_key, hard_clauses, soft_clauses_weighted, vpool, layout)
+        row.update(variables=vpool.top, hard_clauses=len(hard_clauses), soft_clauses=len(soft_clauses_weighted))
+        encode_time = time.time() - start_time
+        row["encode_time"] = round(encode_time, 3)
+
+        # el timeout cubre todo el trabajo, el solver recibe lo que queda
+        remaining = max(1, int(timeout - encode_time))
+        if mode == "3":
+            result = solve_sat(hard_clauses, remaining)
+        else:
+            result = solve_maxsat_rc2(hard_clauses, soft_clauses_weighted, remaining, stratified=True)
+        row.update(status=result.status, cost=result.cost, lower_bound=result.lower_bound,
+                   solve_time=round(result.time, 3))
+    except MemoryError:
+        row.update(status=MEMOUT, error="memory limit exceeded")
+    except Exception as e:
+        row.update(status=ERROR, error=f"{type(e).__name__}: {e}")
+    conn.send(row)
+    conn.close()
+
+class ResultWriter:
+    """Escribe cada fila apenas llega (CSV y/o JSON Lines) para no perder resultados"""
+    def __init__(self, csv_path=None, json_path=None):
+        self.csv_file = open(csv_path, "w", newline="") if csv_path else None
+        self.json_file = open(json_path, "w") if json_path else None
+        self.csv_writer = None
+        if self.csv_file:
+            self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=FIELDS)
+            self.csv_writer.writeheader()
+            self.csv_file.flush()
+
+    def write(self, row):
+        if self.csv_writer:
+            self.csv_writer.writerow(row)
+            self.csv_file.flush()
+        if self.json_file:
+            self.json_file.write(json.dumps(row) + "\n")
+            self.json_file.flush()
+
+    def close(self):
+        for f in (self.csv_file, self.json_file):
+            if f:
+                f.close()
+
+def run_batch(paths, modes, timeout=300, jobs=None, memory_mb=None, clash_encoding="pairwise",
+              normalize=True, writer=None, cache_dir=None):
+    """
+    Corre todos los pares (instancia, modo) con a lo sumo `jobs` procesos a la vez.
+    Retorna la lista de filas en orden de termino
+    """
+    jobs = jobs or os.cpu_count()
+    pending = [(path, mode) for path in paths for mode in modes]
+    running = {}
+    rows = []
+
+    def finish(conn, row):
+        process, _, _ = running.pop(conn)
+        process.join()
+        conn.close()
+        rows.append(row)
+        if writer:
+            writer.write(row)
+        shown = {k: "-" if row[k] is None else row[k] for k in ("cost", "encode_time", "solve_time")}
+        print(f"[{len(rows)}/{len(rows) + len(running) + len(pending)}] {row['instance']} {row['mode']}: "
+              f"{row['status']} cost={shown['cost']} encode={shown['encode_time']}s solve={shown['solve_time']}s",
+              flush=True)
+
+    while pending or running:
+        while pending and len(running) < jobs:
+            path, mode = pending.pop(0)
+            parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(
+                target=run_job, args=(path, mode, timeout, clash_encoding, normalize, memory_mb, cache_dir, child_conn))
+            process.start()
+            child_conn.close()
+            running[parent_conn] = (process, (path, mode), time.time() + timeout + KILL_GRACE)
+
+        for conn in wait(list(running), timeout=1):
+            try:
+                row = conn.recv()
+            except EOFError:
+                process, (path, mode), _ = running[conn]
+                process.join()
+                row = dict.fromkeys(FIELDS)
+                row.update(instance=os.path.basename(path), mode=mode,
+                           status=MEMOUT if memory_mb else ERROR,
+                           error=f"worker exited with code {process.exitcode}")
+            finish(conn, row)
+
+        now = time.time()
+        for conn, (process, (path, mode), deadline) in list(running.items()):
+            if now > deadline:
+                process.kill()
+                row = dict.fromkeys(FIELDS)
+                row.update(instance=os.path.basename(path), mode=mode, status=TIMEOUT,
+                           error="killed after not answering within the timeout")
+                finish(conn, row)
+    return rows
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Run complete_encode.py over many instances and modes in parallel")
+    parser.add_argument("instances", nargs="+", help="instance files or glob patterns (e.g. 'data/comp*.ctt')")
+    parser.add_argument("--modes", default="3,4.1,4.2,4.4", help="comma separated sections (default: 3,4.1,4.2,4.4)")
+    parser.add_argument("--timeout", type=int, default=300, help="per-job timeout in seconds (default: 300)")
+    parser.add_argument("--jobs", type=int, default=None, help="parallel processes (default: number of CPUs)")
+    parser.add_argument("--memory-mb", type=int, default=None, help="per-job address space limit in MB")
+    parser.add_argument("--clash-encoding", choices=CLASH_ENCODINGS, default="pairwise",
+                        help="curriculum/teacher clash encoding (default: pairwise)")
+    parser.add_argument("--no-normalize", dest="normalize", action="store_false",
+                        help="skip clause deduplication/subsumption before solving")
+    parser.add_argument("--cache-dir", default=None,
+                        help="reuse encodings stored in this directory (see complete_encode.py --cache-dir)")
+    parser.add_argument("--csv", help="write results to this CSV file")
+    parser.add_argument("--json", help="write results to this JSON Lines file")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    paths = sorted({p for pattern in args.instances for p in (glob.glob(pattern) or [pattern])})
+    modes = args.modes.split(",")
+    unknown = [m for m in modes if m not in SECTIONS]
+    if unknown:
+        print(f"Unknown mode(s): {', '.join(unknown)}")
+        sys.exit(1)
+
+    print(f"Running {len(paths)} instances x {len(modes)} modes with {args.jobs or os.cpu_count()} processes "
+          f"(timeout: {args.timeout}s, memory: {f'{args.memory_mb} MB' if args.memory_mb else 'unlimited'})")
+    start_time = time.time()
+    writer = ResultWriter(args.csv, args.json)
+    try:
+        rows = run_batch(paths, modes, args.timeout, args.jobs, args.memory_mb, args.clash_encoding,
+                         args.normalize, writer, args.cache_dir)
+    finally:
+        writer.close()
+
+    statuses = {}
+    for row in rows:
+        statuses[row["status"]] = statuses.get(row["status"], 0) + 1
+    print(f"\nFinished {len(rows)} jobs in {time.time() - start_time:.2f}s: "
+          + ", ".join(f"{count} {status}" for status, count in sorted(statuses.items())))
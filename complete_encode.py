@@ -3,15 +3,35 @@ Implementación completa del paper "Curriculum-based course timetabling with SAT
 Incluye todos los enfoques de las Secciones 3, 4.1, 4.2, 4.3, 4.4 y 5
 """
 
+import argparse
+import gc
+import gzip
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import struct
 import sys
+import tempfile
+import threading
 import time
-from dataclasses import dataclass
-from typing import Dict, List, Tuple
-from math import ceil
-from pysat.formula import IDPool, WCNF, CNF
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Set, Tuple
+from math import ceil, copysign
+import numpy as np
+from pysat.formula import IDPool, WCNF
 from pysat.card import CardEnc, EncType, ITotalizer
-from pysat.solvers import Glucose3
-from pysat.examples.rc2 import RC2
+from pysat.solvers import Solver, SolverNames
+from pysat.examples.rc2 import RC2, RC2Stratified
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 # ============= CLASES =============
 @dataclass
@@ -49,6 +69,19 @@ class Instance:
     curricula: Dict[str, Curriculum] 
     unavailabilities: List[Unavailability]
 
+@dataclass
+class InstanceIndex:
+    """Relaciones precalculadas de una Instance; se construye una vez por encoding"""
+    total_hours: int
+    course_curricula: Dict[str, List[str]]
+    teacher_courses: Dict[str, List[str]]
+    course_rooms: Dict[str, Set[str]]
+    course_unavailable: Dict[str, Set[int]]
+    course_hours: Dict[str, Set[int]]
+    day_hours: List[List[int]]
+    hour_day: List[int]
+    conflicts: Dict[str, Set[str]]
+
 # ============= PARSER =============
 def parse_ctt(file_name):
     """Parse archivo .ctt según formato ITC2007"""
@@ -131,674 +164,2554 @@ def map_teacher(courses):
     return teachers
 
 def exactly(literals, k, vpool):
+    if k > len(literals):
+        # No hay literales suficientes (p.ej. variables eliminadas): restriccion insatisfacible
+        return [[]]
     cnf = CardEnc.equals(lits=literals, bound=k, vpool=vpool, encoding=EncType.totalizer)
     return cnf.clauses
 
 def at_least(literals, k, vpool):
+    if k > len(literals):
+        return [[]]
     cnf = CardEnc.atleast(lits=literals, bound=k, vpool=vpool, encoding=EncType.totalizer)
     return cnf.clauses
 
+def at_most(literals, k, vpool):
+    if k >= len(literals):
+        return []
+    cnf = CardEnc.atmost(lits=literals, bound=k, vpool=vpool, encoding=EncType.seqcounter)
+    return cnf.clauses
+
+def totalizer(literals, ubound, vpool):
+    """
+    ITotalizer con sus variables auxiliares tomadas de vpool. rhs[i] queda forzada a
+    verdadero cuando al menos i+1 literales son verdaderos (solo esa direccion).
+    """
+    tot = ITotalizer(lits=literals, ubound=ubound, top_id=vpool.top)
+    vpool.top = max(vpool.top, tot.top_id)
+    return tot
+
+@contextmanager
+def gc_paused():
+    """Pausa el GC ciclico: las listas de clausulas no forman ciclos y solo lo hacen recorrer"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
 def is_first_slot_of_day(h, ppd):
     return h % ppd == 0
 
 def is_last_slot_of_day(h, ppd):
     return (h + 1) % ppd == 0
 
-# ============= VARIABLES =============
-def get_ch(courses, hours, vpool, id_to_var):
-    ch = {}
-    for c in courses:
-        for h in range(hours):
-            var_id = vpool.id()
-            ch[(c, h)] = var_id
-            id_to_var[var_id] = ('ch', c, h)
-    return ch, id_to_var
-
-def get_cd(courses, days, vpool, id_to_var):
-    cd = {}
-    for c in courses:
-        for d in range(days):
-            var_id = vpool.id()
-            cd[(c, d)] = var_id
-            id_to_var[var_id] = ('cd', c, d)
-    return cd, id_to_var
-
-def get_cr(courses, rooms, vpool, id_to_var):
-    cr = {}
-    for c in courses:
-        for r in rooms:
-            var_id = vpool.id()
-            cr[(c, r)] = var_id
-            id_to_var[var_id] = ('cr', c, r)
-    return cr, id_to_var
-
-def get_kh(curricula, hours, vpool, id_to_var):
-    kh = {}
-    for k in curricula:
-        for h in range(hours):
-            var_id = vpool.id()
-            kh[(k, h)] = var_id
-            id_to_var[var_id] = ('kh', k, h)
-    return kh, id_to_var
-
-def get_chr(courses, rooms, hours, vpool, id_to_var):
-    """chr(c,h,r): course c in time slot h in room r (Sección 4.4)"""
-    chr_vars = {}
-    for c in courses:
-        for h in range(hours):
-            for r in rooms:
-                var_id = vpool.id()
-                chr_vars[(c, h, r)] = var_id
-                id_to_var[var_id] = ('chr', c, h, r)
-    return chr_vars, id_to_var
+def adjacent_hours(h, ppd):
+    """Horas vecinas de h dentro del mismo dia"""
+    neighbors = []
+    if not is_first_slot_of_day(h, ppd):
+        neighbors.append(h - 1)
+    if not is_last_slot_of_day(h, ppd):
+        neighbors.append(h + 1)
+    return neighbors
 
-# ============= RELACIONES =============
-def relation_ch_cd(ch, cd, ppd):
+# ============= BUFFERS DE CLÁUSULAS =============
+class ClauseBuffer:
+    """
+    Clausulas como literales int32 concatenados y offsets (la clausula i es
+    lits[offsets[i]:offsets[i+1]]), mas pesos int64 si es weighted.
+    """
+    BATCH_SIZE = 1 << 16
+
+    def __init__(self, weighted=False):
+        self.weighted = weighted
+        self._chunks = []
+        self._arrays = None
+        self._count = 0
+
+    @classmethod
+    def from_arrays(cls, lits, offsets, weights=None):
+        """
+        Envuelve arreglos ya compactados (p.ej. mapeados en memoria) sin copiarlos:
+        si offsets parte en 0 quedan como la forma compacta del buffer.
+        """
+        buf = cls(weighted=weights is not None)
+        buf.add_ragged(lits, np.diff(offsets), weights)
+        if len(offsets) and offsets[0] == 0:
+            buf._arrays = (np.asarray(lits, dtype=np.int32), offsets, weights)
+        return buf
+
+    def __len__(self):
+        return self._count
+
+    def add_rows(self, rows, weights=None):
+        """Agrega clausulas de largo fijo: rows es un arreglo (n, largo)"""
+        rows = np.asarray(rows, dtype=np.int32)
+        if rows.ndim != 2 or len(rows) == 0:
+            return
+        lengths = np.full(len(rows), rows.shape[1], dtype=np.int64)
+        self.add_ragged(rows.reshape(-1), lengths, weights)
+
+    def add_ragged(self, lits, lengths, weights=None):
+        """Agrega clausulas de largo variable: lits concatenados y el largo de cada una"""
+        lengths = np.asarray(lengths, dtype=np.int64)
+        if len(lengths) == 0:
+            return
+        if self.weighted:
+            weights = np.broadcast_to(np.asarray(weights, dtype=np.int64), lengths.shape)
+        self._chunks.append((np.asarray(lits, dtype=np.int32), lengths, weights))
+        self._arrays = None
+        self._count += len(lengths)
+
+    def extend(self, clauses):
+        """Agrega otro ClauseBuffer o una lista de clausulas (de (peso, clausula) si es weighted)"""
+        if isinstance(clauses, ClauseBuffer):
+            lits, offsets, weights = clauses.arrays()
+            self.add_ragged(lits, np.diff(offsets), weights if self.weighted else None)
+            return
+        clauses = list(clauses)
+        if not clauses:
+            return
+        weights = None
+        if self.weighted:
+            weights = [w for w, _ in clauses]
+            clauses = [c for _, c in clauses]
+        lengths = [len(c) for c in clauses]
+        lits = np.fromiter((lit for c in clauses for lit in c), dtype=np.int32, count=sum(lengths))
+        self.add_ragged(lits, lengths, weights)
+
+    def arrays(self):
+        """Retorna (lits, offsets, weights) compactados; weights es None si no es weighted"""
+        if self._arrays is None:
+            if len(self._chunks) == 1:
+                lits, lengths, weights = self._chunks[0]
+            elif self._chunks:
+                lits = np.concatenate([c[0] for c in self._chunks])
+                lengths = np.concatenate([c[1] for c in self._chunks])
+                weights = np.concatenate([c[2] for c in self._chunks]) if self.weighted else None
+            else:
+                lits = np.zeros(0, dtype=np.int32)
+                lengths = np.zeros(0, dtype=np.int64)
+                weights = np.zeros(0, dtype=np.int64) if self.weighted else None
+            offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+            self._arrays = (lits, offsets, weights)
+            self._chunks = [(lits, lengths, weights)]
+        return self._arrays
+
+    def num_literals(self):
+        return int(self.arrays()[1][-1])
+
+    def max_var(self):
+        lits = self.arrays()[0]
+        return int(np.abs(lits).max()) if len(lits) else 0
+
+    def iter_batches(self, batch_size=None):
+        """
+        Entrega las clausulas en lotes de listas de Python, listos para append_formula.
+        Si el buffer es weighted entrega (pesos, clausulas).
+        """
+        batch_size = batch_size or self.BATCH_SIZE
+        lits, offsets, weights = self.arrays()
+        for start in range(0, len(self), batch_size):
+            end = min(start + batch_size, len(self))
+            base = int(offsets[start])
+            flat = lits[base:offsets[end]].tolist()
+            cuts = (offsets[start:end + 1] - base).tolist()
+            clauses = [flat[cuts[i]:cuts[i + 1]] for i in range(end - start)]
+            if self.weighted:
+                yield weights[start:end].tolist(), clauses
+            else:
+                yield clauses
+
+    def __iter__(self):
+        for batch in self.iter_batches():
+            if self.weighted:
+                yield from zip(*batch)
+            else:
+                yield from batch
+
+def pack_clauses(table, mask, lengths):
+    """Clausulas de largo variable: los literales table[mask] y el largo de cada fila (sin los 0)"""
+    lengths = lengths.reshape(-1)
+    return table[mask], lengths[lengths > 0]
+
+# ============= ÍNDICE DE LA INSTANCIA =============
+def build_index(instance):
+    """Construye el InstanceIndex que leen todos los generadores de clausulas"""
+    ppd = instance.periods_per_day
+    total_hours = ppd * instance.num_days
+    courses = instance.courses
+
+    course_curricula = {c_id: [] for c_id in courses}
+    for k, curr in instance.curricula.items():
+        for c in curr.courses:
+            if c in course_curricula:
+                course_curricula[c].append(k)
+
+    course_unavailable = {c_id: set() for c_id in courses}
+    for u in instance.unavailabilities:
+        if u.course_id in course_unavailable:
+            course_unavailable[u.course_id].add(u.day * ppd + u.day_period)
+
+    return InstanceIndex(
+        total_hours=total_hours,
+        course_curricula=course_curricula,
+        teacher_courses=map_teacher(courses),
+        course_rooms=feasible_rooms(courses, instance.rooms),
+        course_unavailable=course_unavailable,
+        course_hours={c_id: set(range(total_hours)) - course_unavailable[c_id] for c_id in courses},
+        day_hours=[hour_for_day(d, ppd) for d in range(instance.num_days)],
+        hour_day=[day(h, ppd) for h in range(total_hours)],
+        conflicts=conflict_graph(courses, instance.curricula)
+    )
+
+def feasible_rooms(courses, rooms):
+    """Salas que puede usar cada curso despues del filtro de capacidad (room capacity HARD)"""
+    rooms_of = {}
+    for c_id, course in courses.items():
+        rooms_of[c_id] = {r_id for r_id, room in rooms.items() if course.num_students <= room.capacity}
+    return rooms_of
+
+def capacity_classes(rooms):
+    """Agrupa las salas de igual capacidad: {clase: [salas]} en el orden de la instancia"""
+    classes = {}
+    for r_id, room in rooms.items():
+        classes.setdefault(f"cap{room.capacity}", []).append(r_id)
+    return classes
+
+def conflict_graph(courses, curricula, teachers=True):
+    """Vecinos de cada curso: cursos con los que comparte curriculum o (si teachers) profesor"""
+    neighbors = {c_id: set() for c_id in courses}
+    groups = [curr.courses for curr in curricula.values()]
+    if teachers:
+        groups.extend(map_teacher(courses).values())
+    for group in groups:
+        members = [c for c in group if c in neighbors]
+        for c in members:
+            neighbors[c].update(members)
+    for c_id in neighbors:
+        neighbors[c_id].discard(c_id)
+    return neighbors
+
+def clash_candidates(conflicts):
+    """Matriz triangular superior de los pares de cursos que no son vecinos en el grafo de conflictos"""
+    separated = np.zeros((len(conflicts), len(conflicts)), dtype=bool)
+    for ci, neighbors in enumerate(conflicts):
+        separated[ci, list(neighbors)] = True
+    return np.triu(~separated, 1)
+
+# ============= CLIQUES / AMO =============
+# Codificacion de curriculum + teacher clashes: "pairwise" es la original (binaria por par),
+# el resto usa un AMO por clique maximal del grafo de conflictos con el encoding indicado
+# ("clique-pairwise": las mismas aristas binarias, pero agrupadas y sin repetir por clique)
+AMO_ENCODINGS = {
+    "clique-pairwise": "pairwise",
+    "ladder": "ladder",
+    "seqcounter": "seqcounter",
+    "commander": "commander",
+}
+CLASH_ENCODINGS = ["pairwise"] + list(AMO_ENCODINGS)
+# Hasta este tamaño un AMO pairwise genera menos clausulas que ladder/seqcounter/commander
+AMO_PAIRWISE_LIMIT = 5
+
+def conflict_cliques(conflicts):
+    """
+    Cubre las aristas del grafo de conflictos con cliques maximales (voraz, una semilla por curso).
+    Retorna una lista de (miembros, aristas que el clique cubre por primera vez)
+    """
+    order = sorted(conflicts, key=lambda c: (-len(conflicts[c]), c))
+    rank = {c: i for i, c in enumerate(order)}
+    cliques = set()
+    for seed in order:
+        for first in sorted(conflicts[seed], key=rank.get):
+            clique = [seed, first]
+            candidates = conflicts[seed] & conflicts[first]
+            while candidates:
+                nxt = min(candidates, key=rank.get)
+                clique.append(nxt)
+                candidates &= conflicts[nxt]
+            cliques.add(frozenset(clique))
+
+    covered = set()
+    cover = []
+    for clique in sorted(cliques, key=lambda q: (-len(q), sorted(q))):
+        members = sorted(clique, key=rank.get)
+        edges = [(a, b) for i, a in enumerate(members) for b in members[i + 1:]]
+        new_edges = [e for e in edges if e not in covered]
+        if new_edges:
+            covered.update(new_edges)
+            cover.append((members, new_edges))
+    return cover
+
+def at_most_one(literals, vpool, encoding):
+    """AMO sobre literals con el encoding indicado (pairwise, ladder, seqcounter o commander)"""
+    if encoding == "commander":
+        return commander_amo(literals, vpool)
+    enc_type = {"pairwise": EncType.pairwise, "ladder": EncType.ladder, "seqcounter": EncType.seqcounter}[encoding]
+    return CardEnc.atmost(lits=literals, bound=1, vpool=vpool, encoding=enc_type).clauses
+
+def commander_amo(literals, vpool, group_size=3):
+    """Commander encoding (Klieber & Kwon) para AMO: pairwise por grupo y AMO recursivo sobre los commanders"""
+    if len(literals) <= group_size + 1:
+        return CardEnc.atmost(lits=literals, bound=1, vpool=vpool, encoding=EncType.pairwise).clauses
     clauses = []
-    for (c, h) in ch:
-        d = day(h, ppd)
-        if (c, d) in cd:
-            clauses.append([-ch[(c, h)], cd[(c, d)]])
-    
-    for (c, d) in cd:
-        hours_day = hour_for_day(d, ppd)
-        clause = [-cd[(c, d)]]
-        for h in hours_day:
-            if (c, h) in ch:
-                clause.append(ch[(c, h)])
-        clauses.append(clause)
+    commanders = []
+    for start in range(0, len(literals), group_size):
+        group = literals[start:start + group_size]
+        cmd = vpool.id()
+        commanders.append(cmd)
+        for i in range(len(group)):
+            clauses.append([-group[i], cmd])
+            for j in range(i + 1, len(group)):
+                clauses.append([-group[i], -group[j]])
+        clauses.append([-cmd] + group)
+    clauses.extend(commander_amo(commanders, vpool, group_size))
     return clauses
 
-def relation_ch_kh(ch, kh, curricula):
-    clauses = []
-    for (c, h) in ch:
-        for k, curr in curricula.items():
-            if c in curr.courses:
-                if (k, h) in kh:
-                    clauses.append([-ch[(c, h)], kh[(k, h)]])
+# ============= VARIABLES =============
+class VarLayout:
+    """
+    Variables ch, cd, cr, kh y chr como arreglos int32 indexados por posicion (ch[c, h],
+    chr[c, h, r], ...); un 0 marca una variable que se sabe falsa y no se crea.
+    Con room_classes las "salas" son las clases de capacity_classes (ver room_groups)
+    """
+    def __init__(self, instance, index, capacity_hard=True, with_chr=False, room_classes=False, start_from=1):
+        self.course_ids = list(instance.courses)
+        self.room_groups = capacity_classes(instance.rooms) if room_classes else None
+        self.room_ids = list(self.room_groups or instance.rooms)
+        self.curriculum_ids = list(instance.curricula)
+        self.course_pos = {c: i for i, c in enumerate(self.course_ids)}
+        self.room_pos = {r: i for i, r in enumerate(self.room_ids)}
+        self.curriculum_pos = {k: i for i, k in enumerate(self.curriculum_ids)}
+        self.num_hours = index.total_hours
+        self.num_days = len(index.day_hours)
+
+        # Vista por posiciones de las relaciones del InstanceIndex
+        self.course_hours = [index.course_hours[c] for c in self.course_ids]
+        self.conflicts = [{self.course_pos[n] for n in index.conflicts[c]} for c in self.course_ids]
+        self.curriculum_courses = [
+            sorted(self.course_pos[c] for c in instance.curricula[k].courses if c in self.course_pos)
+            for k in self.curriculum_ids
+        ]
+        self.teacher_courses = [[self.course_pos[c] for c in group] for group in index.teacher_courses.values()]
+
+        num_courses, num_rooms = len(self.course_ids), len(self.room_ids)
+        ch_mask = np.zeros((num_courses, self.num_hours), dtype=bool)
+        for ci, hours in enumerate(self.course_hours):
+            ch_mask[ci, list(hours)] = True
+        cd_mask = np.stack([ch_mask[:, hours].any(axis=1) for hours in index.day_hours], axis=1)
+        if capacity_hard:
+            if room_classes:
+                raise ValueError("Room classes require soft room capacity")
+            cr_mask = np.array([[r in index.course_rooms[c] for r in self.room_ids] for c in self.course_ids],
+                               dtype=bool).reshape(num_courses, num_rooms)
+        else:
+            cr_mask = np.ones((num_courses, num_rooms), dtype=bool)
+        kh_mask = np.zeros((len(self.curriculum_ids), self.num_hours), dtype=bool)
+        for ki, members in enumerate(self.curriculum_courses):
+            kh_mask[ki] = ch_mask[members].any(axis=0)
+
+        self._blocks = []
+        self.top = start_from - 1
+        self.ch = self._allocate("ch", ch_mask)
+        self.cd = self._allocate("cd", cd_mask)
+        self.cr = self._allocate("cr", cr_mask)
+        self.kh = self._allocate("kh", kh_mask)
+        self.chr = None
+        if with_chr:
+            self.chr = self._allocate("chr", np.repeat(ch_mask[:, :, None], num_rooms, axis=2))
+
+    def _allocate(self, kind, mask):
+        positions = np.flatnonzero(mask)
+        table = np.zeros(mask.shape, dtype=np.int32)
+        table.flat[positions] = np.arange(self.top + 1, self.top + 1 + len(positions), dtype=np.int32)
+        self._blocks.append((self.top + 1, kind, positions, mask.shape))
+        self.top += len(positions)
+        return table
+
+    def decode(self, var_id):
+        """Retorna (familia, posiciones) de una variable estructural, o None si es auxiliar"""
+        for base, kind, positions, shape in self._blocks:
+            if base <= var_id < base + len(positions):
+                return kind, tuple(int(i) for i in np.unravel_index(positions[var_id - base], shape))
+        return None
+
+    def name(self, var_id):
+        """Equivalente al antiguo id_to_var: ('ch', c, h), ('cr', c, r), ('chr', c, h, r), ..."""
+        decoded = self.decode(var_id)
+        if decoded is None:
+            return None
+        kind, pos = decoded
+        if kind in ("ch", "cd", "cr", "chr"):
+            pos = (self.course_ids[pos[0]],) + pos[1:]
+        if kind == "kh":
+            pos = (self.curriculum_ids[pos[0]], pos[1])
+        if kind in ("cr", "chr"):
+            pos = pos[:-1] + (self.room_ids[pos[-1]],)
+        return (kind,) + pos
+
+# ============= RELACIONES =============
+def relation_ch_cd(layout, index):
+    clauses = ClauseBuffer()
+    ch = layout.ch
+    cd = layout.cd
+    # ch -> cd del dia de la hora
+    cd_of_hour = cd[:, index.hour_day]
+    mask = (ch != 0) & (cd_of_hour != 0)
+    clauses.add_rows(np.stack([-ch[mask], cd_of_hour[mask]], axis=1))
     
-    for (k, h) in kh:
-        courses_k = curricula[k].courses
-        clause = [-kh[(k, h)]]
-        for c in courses_k:
-            if (c, h) in ch:
-                clause.append(ch[(c, h)])
-        clauses.append(clause)
+    # cd -> alguna hora disponible del dia (las horas de un dia son contiguas)
+    ch_by_day = ch.reshape(len(ch), layout.num_days, -1)
+    has_cd = (cd != 0)[:, :, None]
+    table = np.concatenate([-cd[:, :, None], ch_by_day], axis=2)
+    mask = np.concatenate([has_cd, has_cd & (ch_by_day != 0)], axis=2)
+    clauses.add_ragged(*pack_clauses(table, mask, mask.sum(axis=2)))
     return clauses
 
-def relation_ch_chr(ch, chr_vars, courses, rooms, total_hours):
-    """Relación ch ↔ chr (Sección 4.4)"""
+def relation_ch_kh(layout, index):
     clauses = []
-    all_room_ids = list(rooms.keys())
+    ch = layout.ch.tolist()
+    kh = layout.kh.tolist()
+    course_curricula = [[layout.curriculum_pos[k] for k in index.course_curricula[c]] for c in layout.course_ids]
+    for ci in range(len(ch)):
+        for h in range(layout.num_hours):
+            if not ch[ci][h]:
+                continue
+            for ki in course_curricula[ci]:
+                if kh[ki][h]:
+                    clauses.append([-ch[ci][h], kh[ki][h]])
     
-    for c in courses:
-        for h in range(total_hours):
-            if (c, h) not in ch:
+    for ki, members in enumerate(layout.curriculum_courses):
+        for h in range(layout.num_hours):
+            if not kh[ki][h]:
                 continue
-            
-            for r in all_room_ids:
-                if (c, h, r) in chr_vars:
-                    clauses.append([-chr_vars[(c, h, r)], ch[(c, h)]])
-            
-            clause = [-ch[(c, h)]]
-            for r in all_room_ids:
-                if (c, h, r) in chr_vars:
-                    clause.append(chr_vars[(c, h, r)])
+            clause = [-kh[ki][h]]
+            for ci in members:
+                if ch[ci][h]:
+                    clause.append(ch[ci][h])
             clauses.append(clause)
-    
     return clauses
 
-def relation_cr_chr(cr, chr_vars, courses, rooms, total_hours):
+def relation_ch_chr(layout):
+    """Relación ch ↔ chr (Sección 4.4)"""
+    clauses = ClauseBuffer()
+    clauses.add_ragged(*definition_clauses(layout.ch, layout.chr))
+    return clauses
+
+def definition_clauses(parent, children):
+    """
+    parent <-> OR(children) con parent de forma (a, b) y children (a, b, n); un 0 es una
+    variable inexistente. Primero [-hijo, parent] por cada hijo y despues [-parent, hijos...]
+    """
+    has_parent = parent != 0
+    has_child = (children != 0) & has_parent[:, :, None]
+    parents = np.broadcast_to(parent[:, :, None], children.shape)
+    binaries = np.stack([-children, parents], axis=3).reshape(parent.shape + (-1,))
+    table = np.concatenate([binaries, -parent[:, :, None], children], axis=2)
+    mask = np.concatenate([np.repeat(has_child, 2, axis=2), has_parent[:, :, None], has_child], axis=2)
+    lengths = np.concatenate([np.where(has_child, 2, 0), (has_parent + has_child.sum(axis=2))[:, :, None]], axis=2)
+    return pack_clauses(table, mask, lengths)
+
+def relation_cr_chr(layout):
     """Relación cr ↔ chr (Sección 4.4)"""
-    clauses = []
-    all_room_ids = list(rooms.keys())
-    
-    for c in courses:
-        for r in all_room_ids:
-            if (c, r) not in cr:
-                continue
-            
-            for h in range(total_hours):
-                if (c, h, r) in chr_vars:
-                    clauses.append([-chr_vars[(c, h, r)], cr[(c, r)]])
-            
-            clause = [-cr[(c, r)]]
-            for h in range(total_hours):
-                if (c, h, r) in chr_vars:
-                    clause.append(chr_vars[(c, h, r)])
-            clauses.append(clause)
-    
+    clauses = ClauseBuffer()
+    clauses.add_ragged(*definition_clauses(layout.cr, layout.chr.transpose(0, 2, 1)))
+    return clauses
+
+def single_room(layout, vpool):
+    """
+    A lo sumo una sala (o clase de salas) por clase (Sección 4.4): pares hasta
+    AMO_PAIRWISE_LIMIT salas y un AMO secuencial con mas
+    """
+    clauses = ClauseBuffer()
+    # chr existe para todas las salas de cada (curso, hora) disponible
+    lits = layout.chr[layout.ch != 0]
+    num_rooms = lits.shape[1]
+    if len(lits) == 0 or num_rooms < 2:
+        return clauses
+    if num_rooms <= AMO_PAIRWISE_LIMIT:
+        i, j = np.triu_indices(num_rooms, 1)
+        clauses.add_rows(np.stack([-lits[:, i], -lits[:, j]], axis=2).reshape(-1, 2))
+        return clauses
+    aux = np.arange(vpool.top + 1, vpool.top + 1 + lits.size - len(lits), dtype=np.int64).reshape(len(lits), -1)
+    vpool.top += aux.size
+    # sala r -> aux r; aux r -> aux r + 1; aux r -> no sala r + 1
+    clauses.add_rows(np.stack([-lits[:, :-1], aux], axis=2).reshape(-1, 2))
+    clauses.add_rows(np.stack([-aux[:, :-1], aux[:, 1:]], axis=2).reshape(-1, 2))
+    clauses.add_rows(np.stack([-aux, -lits[:, 1:]], axis=2).reshape(-1, 2))
     return clauses
 
 # ============= RESTRICCIONES HARD =============
-def curriculum_clashes(ch, curricula, total_hours):
-    clauses = []
-    for k, curriculum in curricula.items():
-        courses_list = list(curriculum.courses)
-        num_courses = len(courses_list)
-        if num_courses < 2:
-            continue
-        for h in range(total_hours):
-            for i in range(num_courses):
-                for j in range(i + 1, num_courses):
-                    c_i = courses_list[i]
-                    c_j = courses_list[j]
-                    if (c_i, h) in ch and (c_j, h) in ch:
-                        clauses.append([-ch[(c_i, h)], -ch[(c_j, h)]])
+def curriculum_clashes(layout):
+    clauses = ClauseBuffer()
+    for courses_list in layout.curriculum_courses:
+        clauses.add_rows(pair_clashes(layout.ch, courses_list))
     return clauses
 
-def teacher_clashes(courses, ch, total_hours):
-    clauses = []
-    teacher_map = map_teacher(courses)
-    for teacher, courses_list in teacher_map.items():
-        num_courses = len(courses_list)
-        if num_courses < 2:
-            continue
-        for h in range(total_hours):
-            for i in range(num_courses):
-                for j in range(i + 1, num_courses):
-                    c_i = courses_list[i]
-                    c_j = courses_list[j]
-                    if (c_i, h) in ch and (c_j, h) in ch:
-                        clauses.append([-ch[(c_i, h)], -ch[(c_j, h)]])
+def pair_clashes(ch, courses_list):
+    """[-ch(c_i, h), -ch(c_j, h)] para cada hora y cada par i < j de courses_list"""
+    if len(courses_list) < 2:
+        return np.zeros((0, 2), dtype=np.int32)
+    members = np.asarray(courses_list)
+    i, j = np.triu_indices(len(members), 1)
+    lits_i = ch[members[i]].T
+    lits_j = ch[members[j]].T
+    mask = (lits_i != 0) & (lits_j != 0)
+    return np.stack([-lits_i[mask], -lits_j[mask]], axis=1)
+
+def teacher_clashes(layout):
+    clauses = ClauseBuffer()
+    for courses_list in layout.teacher_courses:
+        clauses.add_rows(pair_clashes(layout.ch, courses_list))
     return clauses
 
-def room_clashes_basic(ch, cr, courses, rooms, total_hours):
-    """Room clashes para Secciones 3, 4.1, 4.2, 4.3"""
+def course_clashes(layout, vpool, clash_encoding="pairwise"):
+    """
+    Curriculum + teacher clashes. Con "pairwise" se usan las clausulas binarias originales;
+    con cualquier otro valor de CLASH_ENCODINGS se codifica un AMO por clique y por hora.
+    """
+    if clash_encoding == "pairwise":
+        clauses = curriculum_clashes(layout)
+        clauses.extend(teacher_clashes(layout))
+        return clauses
+    return clique_clashes(layout, vpool, AMO_ENCODINGS[clash_encoding])
+
+def clique_clashes(layout, vpool, amo_encoding):
+    """
+    Curriculum + teacher clashes: un AMO por clique maximal y por hora; los cliques chicos y
+    el encoding "pairwise" solo emiten las aristas que ningun clique anterior cubre
+    """
     clauses = []
-    all_course_ids = list(courses.keys())
-    all_room_ids = list(rooms.keys())
-    num_courses = len(all_course_ids)
-    
-    for r in all_room_ids:
-        for h in range(total_hours):
-            for i in range(num_courses):
-                for j in range(i + 1, num_courses):
-                    c_i = all_course_ids[i]
-                    c_j = all_course_ids[j]
-                    if (c_i, h) in ch and (c_j, h) in ch and (c_i, r) in cr and (c_j, r) in cr:
-                        clauses.append([-ch[(c_i, h)], -ch[(c_j, h)], -cr[(c_i, r)], -cr[(c_j, r)]])
+    ch = layout.ch.tolist()
+    cliques = conflict_cliques(dict(enumerate(layout.conflicts)))
+    for h in range(layout.num_hours):
+        for members, new_edges in cliques:
+            literals = [ch[ci][h] for ci in members if ch[ci][h]]
+            if len(literals) < 2:
+                continue
+            if amo_encoding != "pairwise" and len(literals) > AMO_PAIRWISE_LIMIT:
+                clauses.extend(at_most_one(literals, vpool, amo_encoding))
+                continue
+            for c_i, c_j in new_edges:
+                if ch[c_i][h] and ch[c_j][h]:
+                    clauses.append([-ch[c_i][h], -ch[c_j][h]])
     return clauses
 
-def room_clashes_complete(chr_vars, courses, rooms, total_hours):
-    """Room clashes para Sección 4.4 (usando chr)"""
-    clauses = []
-    all_course_ids = list(courses.keys())
-    all_room_ids = list(rooms.keys())
-    num_courses = len(all_course_ids)
-    
-    for h in range(total_hours):
-        for r in all_room_ids:
-            for i in range(num_courses):
-                for j in range(i + 1, num_courses):
-                    c_i = all_course_ids[i]
-                    c_j = all_course_ids[j]
-                    if (c_i, h, r) in chr_vars and (c_j, h, r) in chr_vars:
-                        clauses.append([-chr_vars[(c_i, h, r)], -chr_vars[(c_j, h, r)]])
+def room_clashes_basic(layout):
+    """
+    Room clashes para Secciones 3, 4.1, 4.2, 4.3
+    Solo para pares que caben en la sala, disponibles en la hora y sin curriculum ni profesor comun
+    """
+    clauses = ClauseBuffer()
+    ch = layout.ch
+    cr = layout.cr
+    candidates = clash_candidates(layout.conflicts)
+    for ri in range(len(layout.room_ids)):
+        users = np.flatnonzero(cr[:, ri])
+        i, j = np.nonzero(candidates[np.ix_(users, users)])
+        c_i, c_j = users[i], users[j]
+        lits_i = ch[c_i].T
+        lits_j = ch[c_j].T
+        mask = (lits_i != 0) & (lits_j != 0)
+        pair = np.nonzero(mask)[1]
+        clauses.add_rows(np.stack([-lits_i[mask], -lits_j[mask],
+                                   -cr[c_i[pair], ri], -cr[c_j[pair], ri]], axis=1))
     return clauses
 
-def time_slot_availability(ch, unavailabilities, ppd):
-    clauses = []
-    for u in unavailabilities:
-        hour = u.day * ppd + u.day_period
-        if (u.course_id, hour) in ch:
-            clauses.append([-ch[(u.course_id, hour)]])
+def room_clashes_complete(layout):
+    """
+    Room clashes para Sección 4.4 (usando chr)
+    Solo para pares disponibles en la hora y sin curriculum ni profesor comun
+    """
+    clauses = ClauseBuffer()
+    chr_vars = layout.chr
+    candidates = clash_candidates(layout.conflicts)
+    available = layout.ch != 0
+
+    for h in range(layout.num_hours):
+        i, j = np.nonzero(candidates & available[:, h][:, None] & available[:, h][None, :])
+        lits_i = chr_vars[i, h, :].T
+        lits_j = chr_vars[j, h, :].T
+        mask = (lits_i != 0) & (lits_j != 0)
+        clauses.add_rows(np.stack([-lits_i[mask], -lits_j[mask]], axis=1))
     return clauses
 
-def number_of_lectures(courses, ch, total_hours, vpool):
-    clauses = []
-    for c_id, course in courses.items():
-        literals = []
-        for h in range(total_hours):
-            if (c_id, h) in ch:
-                literals.append(ch[(c_id, h)])
-        if literals:
-            clauses.extend(exactly(literals, course.num_lectures, vpool))
+def room_class_clashes(layout, vpool):
+    """
+    Room clashes sobre clases de salas (modo 4.4c): en cada hora a lo sumo tantos cursos en
+    una clase como salas tiene (pares si la clase tiene una sola sala, si no un AMK)
+    """
+    clauses = ClauseBuffer()
+    chr_vars = layout.chr
+    candidates = clash_candidates(layout.conflicts)
+    available = layout.ch != 0
+    sizes = [len(members) for members in layout.room_groups.values()]
+
+    for h in range(layout.num_hours):
+        i, j = np.nonzero(candidates & available[:, h][:, None] & available[:, h][None, :])
+        for qi, size in enumerate(sizes):
+            if size == 1:
+                lits_i = chr_vars[i, h, qi]
+                lits_j = chr_vars[j, h, qi]
+                mask = (lits_i != 0) & (lits_j != 0)
+                clauses.add_rows(np.stack([-lits_i[mask], -lits_j[mask]], axis=1))
+            else:
+                literals = chr_vars[:, h, qi]
+                clauses.extend(at_most(literals[literals != 0].tolist(), size, vpool))
     return clauses
 
-# ============= RESTRICCIONES SOFT/HARD SEGÚN MODO =============
-def room_capacity_hard(courses, rooms, cr):
-    """Room capacity HARD (Sección 3)"""
+def number_of_lectures(layout, courses, vpool):
     clauses = []
-    for c_id, course in courses.items():
-        ns = course.num_students
-        for r_id, room in rooms.items():
-            if ns > room.capacity and (c_id, r_id) in cr:
-                clauses.append([-cr[(c_id, r_id)]])
+    ch = layout.ch.tolist()
+    for ci, c_id in enumerate(layout.course_ids):
+        literals = [v for v in ch[ci] if v]
+        clauses.extend(exactly(literals, courses[c_id].num_lectures, vpool))
     return clauses
 
-def room_capacity_soft_chr(courses, rooms, chr_vars, total_hours):
+# ============= RESTRICCIONES SOFT/HARD SEGÚN MODO =============
+def room_capacity_soft_chr(layout, courses, rooms):
     """Room capacity SOFT usando chr (Sección 4.4)"""
     weighted_clauses = []
-    for c_id, course in courses.items():
-        ns = course.num_students
-        for r_id, room in rooms.items():
-            if ns > room.capacity:
-                weight = ns - room.capacity
-                for h in range(total_hours):
-                    if (c_id, h, r_id) in chr_vars:
-                        weighted_clauses.append((weight, [-chr_vars[(c_id, h, r_id)]]))
+    chr_vars = layout.chr.tolist()
+    for ci, c_id in enumerate(layout.course_ids):
+        ns = courses[c_id].num_students
+        for ri, r_id in enumerate(layout.room_ids):
+            capacity = rooms[r_id].capacity
+            if ns > capacity:
+                weight = ns - capacity
+                for h in range(layout.num_hours):
+                    if chr_vars[ci][h][ri]:
+                        weighted_clauses.append((weight, [-chr_vars[ci][h][ri]]))
     return weighted_clauses
 
-def room_stability_hard(courses, rooms, cr, vpool):
+def room_stability_hard(layout, vpool):
     """Room stability HARD (Sección 3)"""
     clauses = []
-    all_room_ids = list(rooms.keys())
-    for c_id in courses:
-        literals = []
-        for r_id in all_room_ids:
-            if (c_id, r_id) in cr:
-                literals.append(cr[(c_id, r_id)])
-        if literals:
-            clauses.extend(exactly(literals, 1, vpool))
+    for row in layout.cr.tolist():
+        literals = [v for v in row if v]
+        clauses.extend(exactly(literals, 1, vpool))
     return clauses
 
-def room_stability_soft(courses, rooms, cr, vpool):
-    """Room stability SOFT (Sección 4.4)"""
+def room_stability_soft(layout, vpool):
+    """
+    Room stability SOFT (Sección 4.4): 1 por cada sala distinta despues de la primera,
+    con un ITotalizer por curso sobre las salas usadas (cr)
+    """
     hard_clauses = []
     weighted_clauses = []
-    all_room_ids = list(rooms.keys())
     
-    for c_id in courses:
-        literals = []
-        for r_id in all_room_ids:
-            if (c_id, r_id) in cr:
-                literals.append(cr[(c_id, r_id)])
+    for row in layout.cr.tolist():
+        literals = [v for v in row if v]
         
         if len(literals) <= 1:
             if len(literals) == 1:
                 hard_clauses.append(literals)
             continue
         
-        # Generate totalizer encoding for "at most k rooms"
-        # We want to penalize using more than 1 room, so we use atmost encoding
-        cnf = CardEnc.atmost(lits=literals, bound=len(literals), vpool=vpool, encoding=EncType.totalizer)
-        hard_clauses.extend(cnf.clauses)
-        
-        # The totalizer creates auxiliary variables for "at most i"
-        # We need to extract the "at least k" variables from the encoding
-        # For totalizer, we can create the constraints manually
-        # At least 1 room must be used
+        rooms_used = totalizer(literals, len(literals), vpool)
+        hard_clauses.extend(rooms_used.cnf.clauses)
         hard_clauses.append(literals)  # At least one room
-        
-        # Penalize each additional room beyond the first
-        # We use a different approach: for each pair of rooms, penalize if both are used
-        for i in range(len(literals)):
-            for j in range(i + 1, len(literals)):
-                # Penalize if both room i and room j are used
-                weighted_clauses.append((1, [-literals[i], -literals[j]]))
+        for i in range(1, len(literals)):
+            weighted_clauses.append((1, [-rooms_used.rhs[i]]))
+        rooms_used.delete()
     
     return hard_clauses, weighted_clauses
 
-def min_working_days_hard(courses, cd, days, vpool):
+def min_working_days_hard(layout, courses, vpool):
     """Min working days HARD (Sección 3)"""
     clauses = []
-    for c_id, course in courses.items():
-        literals = []
-        for d in range(days):
-            if (c_id, d) in cd:
-                literals.append(cd[(c_id, d)])
-        k = course.min_working_days
-        if literals and k > 0:
+    cd = layout.cd.tolist()
+    for ci, c_id in enumerate(layout.course_ids):
+        literals = [v for v in cd[ci] if v]
+        k = courses[c_id].min_working_days
+        if k > 0:
             clauses.extend(at_least(literals, k, vpool))
     return clauses
 
-def min_working_days_soft(courses, cd, days, vpool):
-    """Min working days SOFT (Sección 4.2)"""
+MIN_WORKING_DAYS_WEIGHT = 5
+
+def min_working_days_soft(layout, courses, vpool):
+    """
+    Min working days SOFT (Sección 4.2): 5 por cada dia que falte para llegar al minimo,
+    con un ITotalizer por curso sobre los dias no usados (-cd)
+    """
     hard_clauses = []
     weighted_clauses = []
+    cd = layout.cd.tolist()
     
-    for c_id, course in courses.items():
-        literals = []
-        for d in range(days):
-            if (c_id, d) in cd:
-                literals.append(cd[(c_id, d)])
-        
-        k = course.min_working_days
-        if not literals or k <= 0 or k > len(literals):
+    for ci, c_id in enumerate(layout.course_ids):
+        literals = [v for v in cd[ci] if v]
+        k = courses[c_id].min_working_days
+        if k <= 0:
+            continue
+        n = len(literals)
+        if k > n:
+            fixed = vpool.id()
+            hard_clauses.append([-fixed])
+            weighted_clauses.append((MIN_WORKING_DAYS_WEIGHT * (k - n), [fixed]))
+        if n == 0:
             continue
         
-        # Generate totalizer encoding for "at least k days"
-        cnf = CardEnc.atleast(lits=literals, bound=k, vpool=vpool, encoding=EncType.totalizer)
-        hard_clauses.extend(cnf.clauses)
-        
-        # Now we need to extract the auxiliary variables from the totalizer
-        # The totalizer creates variables that represent "at least i literals are true"
-        # We need to penalize having less than k days
-        # For each j from 1 to k-1, penalize "not having at least j days"
-        
-        # Since CardEnc doesn't expose the auxiliary variables directly,
-        # we use a different approach: add soft clauses for each missing day
-        # If we have less than k days, we pay 5 per missing day
-        for j in range(1, k):
-            # Create a soft clause that penalizes having less than j days
-            # This is equivalent to penalizing "not (at least j days)"
-            # We use CardEnc.atleast with bound j and make it soft
-            cnf_j = CardEnc.atleast(lits=literals, bound=j, vpool=vpool, encoding=EncType.totalizer)
-            # The last clause in cnf_j.clauses is the one that enforces "at least j"
-            # We want to make this soft with weight 5
-            if cnf_j.clauses:
-                # Add all clauses except the last one as hard
-                hard_clauses.extend(cnf_j.clauses[:-1])
-                # Add the last clause as soft with weight 5
-                weighted_clauses.append((5, cnf_j.clauses[-1]))
+        unused = totalizer([-v for v in literals], n, vpool)
+        hard_clauses.extend(unused.cnf.clauses)
+        for i in range(max(n - k, 0), n):
+            weighted_clauses.append((MIN_WORKING_DAYS_WEIGHT, [-unused.rhs[i]]))
+        unused.delete()
     
     return hard_clauses, weighted_clauses
 
-def isolated_lectures_hard(kh, curricula, ppd, total_hours):
+def isolated_lectures_hard(layout, ppd):
     """Isolated lectures HARD (Sección 3)"""
-    clauses = []
-    for k_id in curricula:
-        for h in range(total_hours):
-            if (k_id, h) not in kh:
-                continue
-            
-            lit_kh_h = -kh[(k_id, h)]
-            
-            if is_first_slot_of_day(h, ppd):
-                if (k_id, h + 1) in kh:
-                    clauses.append([lit_kh_h, kh[(k_id, h + 1)]])
-            elif is_last_slot_of_day(h, ppd):
-                if (k_id, h - 1) in kh:
-                    clauses.append([lit_kh_h, kh[(k_id, h - 1)]])
-            else:
-                neighbors = []
-                if (k_id, h - 1) in kh:
-                    neighbors.append(kh[(k_id, h - 1)])
-                if (k_id, h + 1) in kh:
-                    neighbors.append(kh[(k_id, h + 1)])
-                if neighbors:
-                    clauses.append([lit_kh_h] + neighbors)
+    clauses = ClauseBuffer()
+    clauses.add_ragged(*isolated_lecture_clauses(layout.kh, ppd))
     return clauses
 
-def isolated_lectures_soft(kh, curricula, ppd, total_hours):
+def isolated_lecture_clauses(kh, ppd):
+    """
+    [-kh(k, h), kh(k, h-1), kh(k, h+1)] con los vecinos del mismo dia que existen.
+    Un vecino sin variable kh (eliminada en el preprocesamiento) es falso.
+    """
+    hours = np.arange(kh.shape[1])
+    prev = np.zeros_like(kh)
+    prev[:, 1:] = kh[:, :-1]
+    prev[:, hours % ppd == 0] = 0
+    nxt = np.zeros_like(kh)
+    nxt[:, :-1] = kh[:, 1:]
+    nxt[:, (hours + 1) % ppd == 0] = 0
+    has = kh != 0
+    table = np.stack([-kh, prev, nxt], axis=2)
+    mask = np.stack([has, has & (prev != 0), has & (nxt != 0)], axis=2)
+    return pack_clauses(table, mask, mask.sum(axis=2))
+
+def isolated_lectures_soft(layout, ppd):
     """Isolated lectures SOFT (Sección 4.1)"""
-    weighted_clauses = []
-    
-    for k_id in curricula:
-        for h in range(total_hours):
-            if (k_id, h) not in kh:
-                continue
-            
-            lit_kh_h = -kh[(k_id, h)]
-            
-            if is_first_slot_of_day(h, ppd):
-                if (k_id, h + 1) in kh:
-                    weighted_clauses.append((2, [lit_kh_h, kh[(k_id, h + 1)]]))
-            elif is_last_slot_of_day(h, ppd):
-                if (k_id, h - 1) in kh:
-                    weighted_clauses.append((2, [lit_kh_h, kh[(k_id, h - 1)]]))
-            else:
-                neighbors = []
-                if (k_id, h - 1) in kh:
-                    neighbors.append(kh[(k_id, h - 1)])
-                if (k_id, h + 1) in kh:
-                    neighbors.append(kh[(k_id, h + 1)])
-                if neighbors:
-                    weighted_clauses.append((2, [lit_kh_h] + neighbors))
-    
+    weighted_clauses = ClauseBuffer(weighted=True)
+    lits, lengths = isolated_lecture_clauses(layout.kh, ppd)
+    weighted_clauses.add_ragged(lits, lengths, 2)
     return weighted_clauses
 
 # ============= ENCODERS POR SECCIÓN =============
-def encode_section_3(instance):
+# Cada seccion es un generador de familias (tipo, funcion, argumentos): la familia se genera
+# recien cuando se consume con generate_families, asi encode_section las acumula en buffers
+# y export_formula las escribe a disco una por una. BOTH es una funcion que retorna (hard, soft).
+# Time slot availability y room capacity HARD no son familias: el VarLayout no crea las
+# variables ch de horas no disponibles ni las cr de salas sin capacidad.
+HARD = "hard"
+SOFT = "soft"
+BOTH = "both"
+
+def families_section_3(instance, layout, index, vpool, clash_encoding):
     """Sección 3: Basic SAT encoding (todo HARD)"""
-    id_to_var = {}
-    vpool = IDPool(start_from=1)
-    hard_clauses = []
-    
     ppd = instance.periods_per_day
-    days = instance.num_days
-    total_hours = ppd * days
     courses = instance.courses
-    curricula = instance.curricula
-    rooms = instance.rooms
-    unavailabilities = instance.unavailabilities
-
-    ch, id_to_var = get_ch(courses, total_hours, vpool, id_to_var)
-    cd, id_to_var = get_cd(courses, days, vpool, id_to_var)
-    cr, id_to_var = get_cr(courses, rooms, vpool, id_to_var)
-    kh, id_to_var = get_kh(curricula, total_hours, vpool, id_to_var)
-
-    hard_clauses.extend(relation_ch_cd(ch, cd, ppd))
-    hard_clauses.extend(relation_ch_kh(ch, kh, curricula))
-    hard_clauses.extend(curriculum_clashes(ch, curricula, total_hours))
-    hard_clauses.extend(teacher_clashes(courses, ch, total_hours))
-    hard_clauses.extend(room_clashes_basic(ch, cr, courses, rooms, total_hours))
-    hard_clauses.extend(time_slot_availability(ch, unavailabilities, ppd))
-    hard_clauses.extend(number_of_lectures(courses, ch, total_hours, vpool))
-    
-    hard_clauses.extend(room_capacity_hard(courses, rooms, cr))
-    hard_clauses.extend(room_stability_hard(courses, rooms, cr, vpool))
-    hard_clauses.extend(min_working_days_hard(courses, cd, days, vpool))
-    hard_clauses.extend(isolated_lectures_hard(kh, curricula, ppd, total_hours))
+
+    yield HARD, relation_ch_cd, (layout, index)
+    yield HARD, relation_ch_kh, (layout, index)
+    yield HARD, course_clashes, (layout, vpool, clash_encoding)
+    yield HARD, room_clashes_basic, (layout,)
+    yield HARD, number_of_lectures, (layout, courses, vpool)
     
-    return hard_clauses, [], vpool
+    yield HARD, room_stability_hard, (layout, vpool)
+    yield HARD, min_working_days_hard, (layout, courses, vpool)
+    yield HARD, isolated_lectures_hard, (layout, ppd)
 
-def encode_section_4_1(instance):
+def families_section_4_1(instance, layout, index, vpool, clash_encoding):
     """Sección 4.1: Relaxing "isolated lectures" as Partial-MaxSAT"""
-    id_to_var = {}
-    vpool = IDPool(start_from=1)
-    hard_clauses = []
-    soft_clauses_weighted = []
-    
     ppd = instance.periods_per_day
-    days = instance.num_days
-    total_hours = ppd * days
     courses = instance.courses
-    curricula = instance.curricula
-    rooms = instance.rooms
-    unavailabilities = instance.unavailabilities
-
-    ch, id_to_var = get_ch(courses, total_hours, vpool, id_to_var)
-    cd, id_to_var = get_cd(courses, days, vpool, id_to_var)
-    cr, id_to_var = get_cr(courses, rooms, vpool, id_to_var)
-    kh, id_to_var = get_kh(curricula, total_hours, vpool, id_to_var)
-
-    hard_clauses.extend(relation_ch_cd(ch, cd, ppd))
-    hard_clauses.extend(relation_ch_kh(ch, kh, curricula))
-    hard_clauses.extend(curriculum_clashes(ch, curricula, total_hours))
-    hard_clauses.extend(teacher_clashes(courses, ch, total_hours))
-    hard_clauses.extend(room_clashes_basic(ch, cr, courses, rooms, total_hours))
-    hard_clauses.extend(time_slot_availability(ch, unavailabilities, ppd))
-    hard_clauses.extend(number_of_lectures(courses, ch, total_hours, vpool))
-    hard_clauses.extend(room_capacity_hard(courses, rooms, cr))
-    hard_clauses.extend(room_stability_hard(courses, rooms, cr, vpool))
-    
-    soft_clauses_weighted.extend(isolated_lectures_soft(kh, curricula, ppd, total_hours))
+
+    yield HARD, relation_ch_cd, (layout, index)
+    yield HARD, relation_ch_kh, (layout, index)
+    yield HARD, course_clashes, (layout, vpool, clash_encoding)
+    yield HARD, room_clashes_basic, (layout,)
+    yield HARD, number_of_lectures, (layout, courses, vpool)
+    yield HARD, room_stability_hard, (layout, vpool)
     
-    return hard_clauses, soft_clauses_weighted, vpool
+    yield SOFT, isolated_lectures_soft, (layout, ppd)
 
-def encode_section_4_2(instance):
+def families_section_4_2(instance, layout, index, vpool, clash_encoding):
     """Sección 4.2: Relaxing "min working days" as Weighted-Partial-MaxSAT"""
-    id_to_var = {}
-    vpool = IDPool(start_from=1)
-    hard_clauses = []
-    soft_clauses_weighted = []
-    
     ppd = instance.periods_per_day
-    days = instance.num_days
-    total_hours = ppd * days
     courses = instance.courses
-    curricula = instance.curricula
-    rooms = instance.rooms
-    unavailabilities = instance.unavailabilities
-
-    ch, id_to_var = get_ch(courses, total_hours, vpool, id_to_var)
-    cd, id_to_var = get_cd(courses, days, vpool, id_to_var)
-    cr, id_to_var = get_cr(courses, rooms, vpool, id_to_var)
-    kh, id_to_var = get_kh(curricula, total_hours, vpool, id_to_var)
-
-    hard_clauses.extend(relation_ch_cd(ch, cd, ppd))
-    hard_clauses.extend(relation_ch_kh(ch, kh, curricula))
-    hard_clauses.extend(curriculum_clashes(ch, curricula, total_hours))
-    hard_clauses.extend(teacher_clashes(courses, ch, total_hours))
-    hard_clauses.extend(room_clashes_basic(ch, cr, courses, rooms, total_hours))
-    hard_clauses.extend(time_slot_availability(ch, unavailabilities, ppd))
-    hard_clauses.extend(number_of_lectures(courses, ch, total_hours, vpool))
-    hard_clauses.extend(room_capacity_hard(courses, rooms, cr))
-    hard_clauses.extend(room_stability_hard(courses, rooms, cr, vpool))
-    
-    soft_clauses_weighted.extend(isolated_lectures_soft(kh, curricula, ppd, total_hours))
+
+    yield HARD, relation_ch_cd, (layout, index)
+    yield HARD, relation_ch_kh, (layout, index)
+    yield HARD, course_clashes, (layout, vpool, clash_encoding)
+    yield HARD, room_clashes_basic, (layout,)
+    yield HARD, number_of_lectures, (layout, courses, vpool)
+    yield HARD, room_stability_hard, (layout, vpool)
     
-    mwd_hard, mwd_soft = min_working_days_soft(courses, cd, days, vpool)
-    hard_clauses.extend(mwd_hard)
-    soft_clauses_weighted.extend(mwd_soft)
+    yield SOFT, isolated_lectures_soft, (layout, ppd)
     
-    return hard_clauses, soft_clauses_weighted, vpool
+    yield BOTH, min_working_days_soft, (layout, courses, vpool)
 
-def encode_section_4_4(instance):
+def families_section_4_4(instance, layout, index, vpool, clash_encoding):
     """Sección 4.4: Complete encoding (todas las soft)"""
-    id_to_var = {}
-    vpool = IDPool(start_from=1)
-    hard_clauses = []
-    soft_clauses_weighted = []
-    
     ppd = instance.periods_per_day
-    days = instance.num_days
-    total_hours = ppd * days
     courses = instance.courses
-    curricula = instance.curricula
     rooms = instance.rooms
-    unavailabilities = instance.unavailabilities
-
-    ch, id_to_var = get_ch(courses, total_hours, vpool, id_to_var)
-    cd, id_to_var = get_cd(courses, days, vpool, id_to_var)
-    cr, id_to_var = get_cr(courses, rooms, vpool, id_to_var)
-    kh, id_to_var = get_kh(curricula, total_hours, vpool, id_to_var)
-    chr_vars, id_to_var = get_chr(courses, rooms, total_hours, vpool, id_to_var)
-
-    hard_clauses.extend(relation_ch_cd(ch, cd, ppd))
-    hard_clauses.extend(relation_ch_kh(ch, kh, curricula))
-    hard_clauses.extend(relation_ch_chr(ch, chr_vars, courses, rooms, total_hours))
-    hard_clauses.extend(relation_cr_chr(cr, chr_vars, courses, rooms, total_hours))
-    hard_clauses.extend(curriculum_clashes(ch, curricula, total_hours))
-    hard_clauses.extend(teacher_clashes(courses, ch, total_hours))
-    hard_clauses.extend(room_clashes_complete(chr_vars, courses, rooms, total_hours))
-    hard_clauses.extend(time_slot_availability(ch, unavailabilities, ppd))
-    hard_clauses.extend(number_of_lectures(courses, ch, total_hours, vpool))
-    
-    soft_clauses_weighted.extend(room_capacity_soft_chr(courses, rooms, chr_vars, total_hours))
+
+    yield HARD, relation_ch_cd, (layout, index)
+    yield HARD, relation_ch_kh, (layout, index)
+    yield HARD, relation_ch_chr, (layout,)
+    yield HARD, relation_cr_chr, (layout,)
+    yield HARD, single_room, (layout, vpool)
+    yield HARD, course_clashes, (layout, vpool, clash_encoding)
+    yield HARD, room_clashes_complete, (layout,)
+    yield HARD, number_of_lectures, (layout, courses, vpool)
     
-    rs_hard, rs_soft = room_stability_soft(courses, rooms, cr, vpool)
-    hard_clauses.extend(rs_hard)
-    soft_clauses_weighted.extend(rs_soft)
+    yield SOFT, room_capacity_soft_chr, (layout, courses, rooms)
     
-    mwd_hard, mwd_soft = min_working_days_soft(courses, cd, days, vpool)
-    hard_clauses.extend(mwd_hard)
-    soft_clauses_weighted.extend(mwd_soft)
+    yield BOTH, room_stability_soft, (layout, vpool)
     
-    soft_clauses_weighted.extend(isolated_lectures_soft(kh, curricula, ppd, total_hours))
+    yield BOTH, min_working_days_soft, (layout, courses, vpool)
     
-    return hard_clauses, soft_clauses_weighted, vpool
+    yield SOFT, isolated_lectures_soft, (layout, ppd)
+
+def families_section_4_4_classes(instance, layout, index, vpool, clash_encoding):
+    """
+    Relajacion de la Sección 4.4: chr elige una clase de salas y room stability se cuenta por
+    clase, asi que el optimo es una cota inferior del costo del horario que arma assign_rooms
+    """
+    class_rooms = {q: instance.rooms[members[0]] for q, members in layout.room_groups.items()}
+    for kind, function, args in families_section_4_4(instance, layout, index, vpool, clash_encoding):
+        if function is room_clashes_complete:
+            yield kind, room_class_clashes, (layout, vpool)
+        elif function is room_capacity_soft_chr:
+            yield kind, function, (layout, instance.courses, class_rooms)
+        else:
+            yield kind, function, args
+
+# modo -> (generador de familias, opciones del VarLayout)
+SECTIONS = {
+    "3": (families_section_3, dict(capacity_hard=True)),
+    "4.1": (families_section_4_1, dict(capacity_hard=True)),
+    "4.2": (families_section_4_2, dict(capacity_hard=True)),
+    "4.4": (families_section_4_4, dict(capacity_hard=False, with_chr=True)),
+    "4.4c": (families_section_4_4_classes, dict(capacity_hard=False, with_chr=True, room_classes=True)),
+}
+
+SECTION_TITLES = {
+    "3": "Basic SAT (all constraints hard)",
+    "4.1": "Partial MaxSAT (isolated lectures soft)",
+    "4.2": "Weighted Partial MaxSAT (isolated + min days soft)",
+    "4.4": "Complete encoding (all soft)",
+    "4.4c": "Complete encoding relaxed to rooms grouped by capacity (all soft, cost is a lower bound)",
+}
+# modos cuyo costo MaxSAT no es el del horario decodificado sino una cota inferior
+RELAXED_SECTIONS = ("4.4c",)
+
+def section_specs(mode, instance, index=None, clash_encoding="pairwise"):
+    """Retorna (layout, vpool, specs) con specs el generador de (tipo, funcion, argumentos)"""
+    families, layout_options = SECTIONS[mode]
+    if index is None:
+        index = build_index(instance)
+
+    layout = VarLayout(instance, index, **layout_options)
+    vpool = IDPool(start_from=layout.top + 1)
+    return layout, vpool, families(instance, layout, index, vpool, clash_encoding)
+
+def generate_families(specs):
+    """Genera cada familia en orden y entrega (HARD/SOFT, clausulas)"""
+    for kind, function, args in specs:
+        clauses = function(*args)
+        if kind == BOTH:
+            yield HARD, clauses[0]
+            yield SOFT, clauses[1]
+        else:
+            yield kind, clauses
+
+def section_families(mode, instance, index=None, clash_encoding="pairwise"):
+    """
+    Retorna (layout, vpool, families) sin generar clausulas todavia; vpool.top solo es
+    definitivo despues de consumir families completo
+    """
+    layout, vpool, specs = section_specs(mode, instance, index, clash_encoding)
+    return layout, vpool, generate_families(specs)
+
+def encode_section(mode, instance, index=None, clash_encoding="pairwise"):
+    return encode_with_layout(mode, instance, index, clash_encoding)[:3]
+
+@gc_paused()
+def encode_with_layout(mode, instance, index=None, clash_encoding="pairwise"):
+    """Como encode_section, pero retorna tambien el VarLayout: (hard, soft, vpool, layout)"""
+    layout, vpool, families = section_families(mode, instance, index, clash_encoding)
+    return collect_families(families) + (vpool, layout)
+
+def collect_families(families):
+    """Acumula (HARD/SOFT, clausulas) en (hard_clauses, soft_clauses_weighted)"""
+    hard_clauses = ClauseBuffer()
+    soft_clauses_weighted = ClauseBuffer(weighted=True)
+    for kind, clauses in families:
+        if kind == HARD:
+            hard_clauses.extend(clauses)
+        else:
+            soft_clauses_weighted.extend(clauses)
+    return hard_clauses, soft_clauses_weighted
+
+def encode_section_3(instance, index=None, clash_encoding="pairwise"):
+    """Sección 3: Basic SAT encoding (todo HARD)"""
+    return encode_section("3", instance, index, clash_encoding)
+
+def encode_section_4_1(instance, index=None, clash_encoding="pairwise"):
+    """Sección 4.1: Relaxing "isolated lectures" as Partial-MaxSAT"""
+    return encode_section("4.1", instance, index, clash_encoding)
+
+def encode_section_4_2(instance, index=None, clash_encoding="pairwise"):
+    """Sección 4.2: Relaxing "min working days" as Weighted-Partial-MaxSAT"""
+    return encode_section("4.2", instance, index, clash_encoding)
+
+def encode_section_4_4(instance, index=None, clash_encoding="pairwise"):
+    """Sección 4.4: Complete encoding (todas las soft)"""
+    return encode_section("4.4", instance, index, clash_encoding)
+
+# ============= NORMALIZACIÓN =============
+@dataclass
+class NormalizationStats:
+    duplicates: int = 0
+    tautologies: int = 0
+    subsumed: int = 0
+    soft_merged: int = 0
+    soft_satisfied: int = 0
+
+    @property
+    def removed(self):
+        return self.duplicates + self.tautologies + self.subsumed + self.soft_merged + self.soft_satisfied
+
+def normalize_clause(clause):
+    """Ordena y elimina literales repetidos; retorna None si la clausula es una tautologia"""
+    lits = tuple(sorted(set(clause)))
+    # Solo una clausula con literales de ambos signos puede ser tautologia
+    if lits and lits[0] < 0 < lits[-1] and not set(lits).isdisjoint([-lit for lit in lits if lit < 0]):
+        return None
+    return lits
+
+@gc_paused()
+def normalize_formula(hard_clauses, soft_clauses_weighted):
+    """
+    Elimina tautologias, duplicadas, subsumidas por unitarias hard y soft ya satisfechas, y
+    fusiona soft iguales. Retorna (hard_clauses, soft_clauses_weighted, NormalizationStats)
+    """
+    stats = NormalizationStats()
+    lits, offsets, _ = hard_clauses.arrays()
+    units = lits[offsets[:-1][np.diff(offsets) == 1]]
+    hard_groups = _clause_rows(hard_clauses, stats)
+    soft_groups = _clause_rows(soft_clauses_weighted, stats)
+    soft_weights = soft_clauses_weighted.arrays()[2]
+
+    hard, soft = [], []
+    for width in sorted(set(hard_groups) | set(soft_groups)):
+        empty = (np.zeros(0, dtype=np.int64), np.zeros((0, width), dtype=np.int32))
+        hard_ids, hard_rows = hard_groups.get(width, empty)
+        soft_ids, soft_rows = soft_groups.get(width, empty)
+
+        if width > 1:
+            subsumed = np.isin(hard_rows, units).any(axis=1)
+            stats.subsumed += int(subsumed.sum())
+            hard_ids, hard_rows = hard_ids[~subsumed], hard_rows[~subsumed]
+        satisfied = np.isin(soft_rows, units).any(axis=1)
+
+        keys = _row_keys(np.concatenate([hard_rows, soft_rows]))
+        hard_keys, soft_keys = keys[:len(hard_rows)], keys[len(hard_rows):]
+
+        _, first = np.unique(hard_keys, return_index=True)
+        stats.duplicates += len(hard_rows) - len(first)
+        hard.append((hard_ids[first], hard_rows[first]))
+
+        satisfied |= np.isin(soft_keys, hard_keys)
+        stats.soft_satisfied += int(satisfied.sum())
+        soft_ids, soft_rows, soft_keys = soft_ids[~satisfied], soft_rows[~satisfied], soft_keys[~satisfied]
+        _, first, merged = np.unique(soft_keys, return_index=True, return_inverse=True)
+        stats.soft_merged += len(soft_rows) - len(first)
+        weights = np.zeros(len(first), dtype=np.int64)
+        np.add.at(weights, merged.reshape(-1), soft_weights[soft_ids])
+        soft.append((soft_ids[first], soft_rows[first], weights))
+
+    return _assemble_rows(hard, False), _assemble_rows(soft, True), stats
+
+def _row_keys(rows):
+    """Un entero por fila: filas iguales reciben el mismo (lexsort por columnas)"""
+    keys = np.zeros(len(rows), dtype=np.int64)
+    if len(rows) == 0 or rows.shape[1] == 0:
+        return keys
+    order = np.lexsort(rows.T[::-1])
+    sorted_rows = rows[order]
+    new_key = np.ones(len(rows), dtype=bool)
+    new_key[1:] = (sorted_rows[1:] != sorted_rows[:-1]).any(axis=1)
+    keys[order] = np.cumsum(new_key) - 1
+    return keys
+
+def _clause_rows(clauses, stats):
+    """
+    Agrupa las clausulas normalizadas por largo: {largo: (indices, filas ordenadas)},
+    con los indices en orden creciente. Las tautologias se cuentan y se descartan.
+    """
+    lits, offsets, _ = clauses.arrays()
+    lengths = np.diff(offsets)
+    groups = {}
+    repeated_ids = []
+    for width in np.unique(lengths).tolist():
+        ids = np.flatnonzero(lengths == width)
+        rows = np.sort(lits[offsets[ids][:, None] + np.arange(width)], axis=1)
+        if width > 1:
+            by_var = np.sort(np.abs(rows), axis=1)
+            repeated = (by_var[:, 1:] == by_var[:, :-1]).any(axis=1)
+            repeated_ids.extend(ids[repeated].tolist())
+            ids, rows = ids[~repeated], rows[~repeated]
+        groups[width] = ([ids], [rows])
+
+    for i in repeated_ids:
+        norm = normalize_clause(lits[offsets[i]:offsets[i + 1]].tolist())
+        if norm is None:
+            stats.tautologies += 1
+            continue
+        ids, rows = groups.setdefault(len(norm), ([], []))
+        ids.append(np.array([i], dtype=np.int64))
+        rows.append(np.array([norm], dtype=np.int32).reshape(1, len(norm)))
+
+    for width, (ids, rows) in groups.items():
+        ids, rows = np.concatenate(ids), np.concatenate(rows)
+        order = np.argsort(ids, kind="stable")
+        groups[width] = (ids[order], rows[order])
+    return groups
+
+def _assemble_rows(parts, weighted):
+    """Arma un ClauseBuffer con las filas de cada largo en el orden de sus indices originales"""
+    clauses = ClauseBuffer(weighted=weighted)
+    if not parts:
+        return clauses
+    ids = np.concatenate([part[0] for part in parts])
+    lengths = np.concatenate([np.full(len(part[0]), part[1].shape[1], dtype=np.int64) for part in parts])
+    order = np.argsort(ids, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.cumsum(lengths[order], out=offsets[1:])
+
+    lits = np.empty(offsets[-1], dtype=np.int32)
+    start = 0
+    for part in parts:
+        part_ids, rows = part[0], part[1]
+        positions = offsets[rank[start:start + len(part_ids)]]
+        lits[positions[:, None] + np.arange(rows.shape[1])] = rows
+        start += len(part_ids)
+    weights = np.concatenate([part[2] for part in parts])[order] if weighted else None
+    clauses.add_ragged(lits, lengths[order], weights)
+    return clauses
+
+# ============= FORMATO BINARIO =============
+# Archivo .ccnf: header de 64 bytes y luego los arreglos de los ClauseBuffers hard/soft
+#     hard_lits int32 | soft_lits int32 | hard_offsets int64 | soft_offsets int64 | soft_weights int64
+# (cada seccion alineada a 8 bytes, little endian). Se lee con mmap, asi varios procesos
+# comparten la misma formula a traves del page cache sin copiarla.
+FORMULA_SUFFIX = ".ccnf"
+FORMULA_MAGIC = b"CCTFORM\0"
+FORMULA_VERSION = 1
+# magic, version, num_vars, num_hard, literales hard, num_soft, literales soft
+FORMULA_HEADER = struct.Struct("<8sI4xqqqqq")
+FORMULA_HEADER_SIZE = 64
+
+def _pad(f):
+    f.write(b"\0" * (-f.tell() % 8))
+
+class FormulaWriter:
+    """
+    Escribe una formula .ccnf familia por familia con add(kind, clauses); el archivo aparece
+    completo (rename atomico) al cerrar el writer
+    """
+    def __init__(self, path):
+        self.path = path
+        self.tmp = f"{path}.tmp{os.getpid()}"
+        self.file = open(self.tmp, "wb")
+        self.file.write(b"\0" * FORMULA_HEADER_SIZE)
+        self.soft_file = tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(path)))
+        self.hard_lengths = []
+        self.soft_lengths = []
+        self.soft_weights = []
+        self.num_hard = 0
+        self.num_soft = 0
+        self.num_hard_lits = 0
+        self.num_soft_lits = 0
+        self.num_vars = 0
+
+    def add(self, kind, clauses):
+        clauses = as_buffer(kind, clauses)
+        lits, offsets, weights = clauses.arrays()
+        lits = np.asarray(lits, dtype="<i4")
+        if kind == HARD:
+            lits.tofile(self.file)
+            self.hard_lengths.append(np.diff(offsets))
+            self.num_hard += len(clauses)
+            self.num_hard_lits += len(lits)
+        else:
+            lits.tofile(self.soft_file)
+            self.soft_lengths.append(np.diff(offsets))
+            self.soft_weights.append(np.asarray(weights, dtype="<i8"))
+            self.num_soft += len(clauses)
+            self.num_soft_lits += len(lits)
+        self.num_vars = max(self.num_vars, clauses.max_var())
+
+    def close(self):
+        _pad(self.file)
+        self.soft_file.seek(0)
+        shutil.copyfileobj(self.soft_file, self.file)
+        self.soft_file.close()
+        _pad(self.file)
+        for lengths in (self.hard_lengths, self.soft_lengths):
+            offsets = np.zeros(sum(map(len, lengths)) + 1, dtype="<i8")
+            if len(offsets) > 1:
+                np.cumsum(np.concatenate(lengths), out=offsets[1:])
+            offsets.tofile(self.file)
+        for weights in self.soft_weights:
+            weights.tofile(self.file)
+
+        self.file.seek(0)
+        self.file.write(FORMULA_HEADER.pack(
+            FORMULA_MAGIC, FORMULA_VERSION, self.num_vars,
+            self.num_hard, self.num_hard_lits, self.num_soft, self.num_soft_lits))
+        self.file.close()
+        os.replace(self.tmp, self.path)
+
+    def discard(self):
+        self.soft_file.close()
+        self.file.close()
+        os.remove(self.tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+def write_formula(path, hard_clauses, soft_clauses_weighted, num_vars=0):
+    with FormulaWriter(path) as writer:
+        writer.add(HARD, hard_clauses)
+        writer.add(SOFT, soft_clauses_weighted)
+        writer.num_vars = max(writer.num_vars, num_vars)
+
+def read_formula(path):
+    """Abre un .ccnf con mmap y retorna (hard_clauses, soft_clauses_weighted, num_vars)"""
+    with open(path, "rb") as f:
+        header = f.read(FORMULA_HEADER_SIZE)
+    if len(header) < FORMULA_HEADER_SIZE or not header.startswith(FORMULA_MAGIC):
+        raise ValueError(f"{path} is not a binary formula file")
+    _, version, num_vars, num_hard, hard_lits, num_soft, soft_lits = FORMULA_HEADER.unpack_from(header)
+    if version != FORMULA_VERSION:
+        raise ValueError(f"{path} has formula version {version}, expected {FORMULA_VERSION}")
+
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    position = FORMULA_HEADER_SIZE
+
+    def take(dtype, count):
+        nonlocal position
+        size = count * np.dtype(dtype).itemsize
+        array = data[position:position + size].view(dtype)
+        position += size + (-size % 8)
+        return array
+
+    arrays = [take("<i4", hard_lits), take("<i4", soft_lits),
+              take("<i8", num_hard + 1), take("<i8", num_soft + 1), take("<i8", num_soft)]
+    hard_clauses = ClauseBuffer.from_arrays(arrays[0], arrays[2])
+    soft_clauses_weighted = ClauseBuffer.from_arrays(arrays[1], arrays[3], arrays[4])
+    return hard_clauses, soft_clauses_weighted, num_vars
+
+# ============= CACHE DE ENCODINGS =============
+# Cambiar cuando cambie la formula que generan los encoders: invalida las entradas del cache
+ENCODER_VERSION = 5
+
+class EncodingCache:
+    """
+    Cache en disco de encodings: un directorio por clave con formula.ccnf, layout.pkl y
+    meta.json. Al guardar se eliminan las entradas menos usadas hasta no superar max_bytes
+    """
+    def __init__(self, directory, max_bytes=2 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(path, mode, clash_encoding="pairwise", normalized=False):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        digest.update(f"|{mode}|{clash_encoding}|{normalized}|{ENCODER_VERSION}".encode())
+        return digest.hexdigest()[:24]
+
+    def load(self, key):
+        """Retorna (hard, soft, vpool, layout) o None si la clave no esta"""
+        entry = os.path.join(self.directory, key)
+        meta_path = os.path.join(entry, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        hard_clauses, soft_clauses_weighted, _ = read_formula(os.path.join(entry, "formula" + FORMULA_SUFFIX))
+        with open(os.path.join(entry, "layout.pkl"), "rb") as f:
+            layout = pickle.load(f)
+        os.utime(meta_path)
+        return hard_clauses, soft_clauses_weighted, IDPool(start_from=meta["top"] + 1), layout
+
+    def store(self, key, hard_clauses, soft_clauses_weighted, vpool, layout):
+        entry = os.path.join(self.directory, key)
+        tmp = entry + f".tmp{os.getpid()}"
+        os.makedirs(tmp, exist_ok=True)
+        write_formula(os.path.join(tmp, "formula" + FORMULA_SUFFIX), hard_clauses, soft_clauses_weighted, vpool.top)
+        with open(os.path.join(tmp, "layout.pkl"), "wb") as f:
+            pickle.dump(layout, f, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({"top": vpool.top, "version": ENCODER_VERSION}, f)
+        if not os.path.exists(os.path.join(entry, "meta.json")):
+            # restos de una entrada incompleta: sin borrarlos el rename fallaria siempre
+            shutil.rmtree(entry, ignore_errors=True)
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # otro proceso guardo la misma clave primero
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict(keep=entry)
+
+    def entries(self):
+        """Lista de (ultimo uso, bytes, directorio) de las entradas completas"""
+        result = []
+        for name in os.listdir(self.directory):
+            entry = os.path.join(self.directory, name)
+            meta_path = os.path.join(entry, "meta.json")
+            if ".tmp" in name or not os.path.exists(meta_path):
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+            result.append((os.path.getmtime(meta_path), size, entry))
+        return sorted(result)
+
+    def evict(self, keep=None):
+        """Elimina las entradas menos usadas (salvo keep) hasta no superar max_bytes"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+# ============= EXPORTACIÓN =============
+HEADER_WIDTH = 64
+
+@dataclass
+class ExportStats:
+    num_vars: int = 0
+    num_hard: int = 0
+    num_soft: int = 0
+    top_weight: int = 1
+    passes: int = 1
+
+def export_format(path):
+    """Retorna (formato, compresion) segun la extension: 'cnf'/'wcnf'/'ccnf' y None/'gz'/'zst'"""
+    name = path.lower()
+    if name.endswith(FORMULA_SUFFIX):
+        return "ccnf", None
+    compression = None
+    for suffix in ("gz", "zst"):
+        if name.endswith("." + suffix):
+            compression = suffix
+            name = name[:-len(suffix) - 1]
+    if name.endswith(".cnf"):
+        return "cnf", compression
+    if name.endswith(".wcnf"):
+        return "wcnf", compression
+    raise ValueError(f"Unknown export format for {path} (expected .cnf or .wcnf, optionally .gz/.zst, "
+                     f"or {FORMULA_SUFFIX})")
+
+def open_export(path, compression):
+    if compression == "gz":
+        return gzip.open(path, "wt", encoding="ascii")
+    if compression == "zst":
+        if zstandard is None:
+            raise RuntimeError("zstd compression requires the 'zstandard' package")
+        stream = zstandard.ZstdCompressor().stream_writer(open(path, "wb"), closefd=True)
+        return io.TextIOWrapper(stream, encoding="ascii")
+    return open(path, "w", encoding="ascii")
+
+def as_buffer(kind, clauses):
+    if isinstance(clauses, ClauseBuffer):
+        return clauses
+    buf = ClauseBuffer(weighted=kind == SOFT)
+    buf.extend(clauses)
+    return buf
+
+def count_formula(mode, instance, index=None, clash_encoding="pairwise"):
+    """Primera pasada: genera las familias solo para contar variables, clausulas y el peso top"""
+    _, vpool, families = section_families(mode, instance, index, clash_encoding)
+    stats = count_families(families)
+    stats.num_vars = max(stats.num_vars, vpool.top)
+    return stats
+
+def count_families(families):
+    stats = ExportStats()
+    for kind, clauses in families:
+        clauses = as_buffer(kind, clauses)
+        stats.num_vars = max(stats.num_vars, clauses.max_var())
+        if kind == HARD:
+            stats.num_hard += len(clauses)
+        else:
+            weights = clauses.arrays()[2]
+            stats.num_hard += int((weights == 0).sum())
+            stats.num_soft += int((weights > 0).sum())
+            stats.top_weight += int(weights[weights > 0].sum())
+    return stats
+
+def write_family(out, kind, clauses, hard_prefix, stats):
+    """
+    Escribe una familia en DIMACS y actualiza stats. Las hard (y las soft de peso 0) llevan
+    hard_prefix: '', 'h ' o el peso top
+    """
+    clauses = as_buffer(kind, clauses)
+    stats.num_vars = max(stats.num_vars, clauses.max_var())
+    for batch in clauses.iter_batches():
+        if kind == HARD:
+            out.writelines(f"{hard_prefix}{' '.join(map(str, c))} 0\n" for c in batch)
+            stats.num_hard += len(batch)
+            continue
+        for weight, clause in zip(*batch):
+            if weight > 0:
+                out.write(f"{weight} {' '.join(map(str, clause))} 0\n")
+                stats.num_soft += 1
+                stats.top_weight += weight
+            elif weight == 0:
+                out.write(f"{hard_prefix}{' '.join(map(str, clause))} 0\n")
+                stats.num_hard += 1
+
+@gc_paused()
+def export_formula(mode, instance, path, wcnf_format="new", index=None, clash_encoding="pairwise"):
+    """
+    Escribe el encoding de una seccion en path (.cnf/.wcnf con .gz/.zst opcional, o .ccnf)
+    familia por familia. wcnf_format "old" lleva header y cuenta en una primera pasada
+    """
+    fmt, compression = export_format(path)
+    if fmt == "cnf" and mode != "3":
+        raise ValueError(f"Section {mode} has soft clauses, export it as .wcnf")
+    if index is None:
+        index = build_index(instance)
+    if fmt == "ccnf":
+        _, vpool, families = section_families(mode, instance, index, clash_encoding)
+        with FormulaWriter(path) as writer:
+            for kind, clauses in families:
+                writer.add(kind, clauses)
+            writer.num_vars = max(writer.num_vars, vpool.top)
+        return ExportStats(num_vars=writer.num_vars, num_hard=writer.num_hard, num_soft=writer.num_soft)
+
+    header = fmt == "cnf" or wcnf_format == "old"
+    counted = None
+    if header and (compression or fmt == "wcnf"):
+        counted = count_formula(mode, instance, index, clash_encoding)
+
+    if fmt == "cnf":
+        hard_prefix = ""
+    elif wcnf_format == "old":
+        hard_prefix = f"{counted.top_weight} "
+    else:
+        hard_prefix = "h "
+
+    stats = ExportStats(passes=2 if counted else 1)
+    with open_export(path, compression) as out:
+        out.write(f"c {instance.name} section {mode}\n")
+        header_offset = out.tell() if header and not counted else None
+        if counted and fmt == "cnf":
+            out.write(f"p cnf {counted.num_vars} {counted.num_hard}\n")
+        elif counted:
+            out.write(f"p wcnf {counted.num_vars} {counted.num_hard + counted.num_soft} {counted.top_weight}\n")
+        elif header:
+            out.write(" " * (HEADER_WIDTH - 1) + "\n")
+
+        _, vpool, families = section_families(mode, instance, index, clash_encoding)
+        for kind, clauses in families:
+            write_family(out, kind, clauses, hard_prefix, stats)
+        stats.num_vars = max(stats.num_vars, vpool.top)
+
+        if header_offset is not None:
+            out.seek(header_offset)
+            out.write(f"p cnf {stats.num_vars} {stats.num_hard}".ljust(HEADER_WIDTH - 1))
+    return stats
+
+def export_buffers(hard_clauses, soft_clauses_weighted, path, wcnf_format="new", num_vars=0, comment=None):
+    """Igual que export_formula pero desde buffers ya armados (p.ej. leidos de un .ccnf)"""
+    fmt, compression = export_format(path)
+    if fmt == "ccnf":
+        write_formula(path, hard_clauses, soft_clauses_weighted, num_vars)
+        return ExportStats(num_vars=max(num_vars, hard_clauses.max_var(), soft_clauses_weighted.max_var()),
+                           num_hard=len(hard_clauses), num_soft=len(soft_clauses_weighted))
+    if fmt == "cnf" and len(soft_clauses_weighted):
+        raise ValueError("The formula has soft clauses, export it as .wcnf")
+
+    families = [(HARD, hard_clauses), (SOFT, soft_clauses_weighted)]
+    counted = count_families(families)
+    counted.num_vars = max(counted.num_vars, num_vars)
+    if fmt == "cnf":
+        hard_prefix = ""
+    elif wcnf_format == "old":
+        hard_prefix = f"{counted.top_weight} "
+    else:
+        hard_prefix = "h "
+
+    stats = ExportStats(num_vars=counted.num_vars)
+    with open_export(path, compression) as out:
+        if comment:
+            out.write(f"c {comment}\n")
+        if fmt == "cnf":
+            out.write(f"p cnf {counted.num_vars} {counted.num_hard}\n")
+        elif wcnf_format == "old":
+            out.write(f"p wcnf {counted.num_vars} {counted.num_hard + counted.num_soft} {counted.top_weight}\n")
+        for kind, clauses in families:
+            write_family(out, kind, clauses, hard_prefix, stats)
+    return stats
 
 # ============= SOLVERS =============
-def solve_sat(hard_clauses, timeout=300):
-    """Solver SAT para Sección 3"""
-    print("Starting SAT solver (Glucose3)...")
+def buffers_to_wcnf(hard_clauses, soft_clauses_weighted):
+    """
+    Arma el WCNF por lotes directamente desde los buffers (sin WCNF.append por clausula).
+    Las soft de peso 0 pasan a hard y las de peso negativo se descartan.
+    """
+    wcnf = WCNF()
+    for clauses in hard_clauses.iter_batches():
+        wcnf.hard.extend(clauses)
+    for weights, clauses in soft_clauses_weighted.iter_batches():
+        for weight, clause in zip(weights, clauses):
+            if weight > 0:
+                wcnf.soft.append(clause)
+                wcnf.wght.append(weight)
+            elif weight == 0:
+                wcnf.hard.append(clause)
+    wcnf.topw += sum(wcnf.wght)
+    wcnf.nv = max(hard_clauses.max_var(), soft_clauses_weighted.max_var())
+    return wcnf
+
+# Solvers de PySAT sin solve_limited / interrupt: solo se pueden detener matando el proceso
+UNINTERRUPTIBLE = ("cadical", "lingeling", "kissat")
+
+def solver_family(name):
+    """Nombre canonico de PySAT (p.ej. 'g3' -> 'glucose3'); None si no existe"""
+    for family, names in vars(SolverNames).items():
+        if not family.startswith("_") and name in names:
+            return family
+    return None
+
+def solver_interruptible(name):
+    family = solver_family(name)
+    return family is not None and not family.startswith(UNINTERRUPTIBLE)
+
+# estrategias BLO/estratificacion de RC2Stratified
+BLO_STRATEGIES = ("div", "cluster", "full", "basic", "none")
+MAXSAT_ALGORITHMS = ("rc2", "lsu")
+
+SAT = "SAT"
+UNSAT = "UNSAT"
+TIMEOUT = "TIMEOUT"
+UNKNOWN = "UNKNOWN"
+OPTIMUM = "OPTIMUM"
+
+@dataclass
+class SolveResult:
+    status: str
+    cost: int = None
+    time: float = 0.0
+    model: List[int] = None
+    stats: Dict[str, int] = field(default_factory=dict)
+    lower_bound: int = None
+    solver: str = None
+    core: list = None
+    strata: list = None
+
+def solve_sat(hard_clauses, timeout=300, conf_budget=None, prop_budget=None, solver_name="g3", phases=None):
+    """
+    Solver SAT para Sección 3
+    Detenido sin respuesta retorna TIMEOUT (por tiempo) o UNKNOWN (por budget), nunca UNSAT
+    """
+    print(f"Starting SAT solver ({solver_name})...")
     start_time = time.time()
     
-    solver = Glucose3()
-    for clause in hard_clauses:
-        solver.add_clause(clause)
+    solver = Solver(name=solver_name)
+    for clauses in hard_clauses.iter_batches():
+        solver.append_formula(clauses)
+    if phases:
+        solver.set_phases(phases)
+    interruptible = solver_interruptible(solver_name)
+    if not interruptible:
+        print(f"Warning: {solver_name} cannot be interrupted, ignoring timeout and budgets")
+        timeout = conf_budget = prop_budget = None
+    if conf_budget:
+        solver.conf_budget(conf_budget)
+    if prop_budget:
+        solver.prop_budget(prop_budget)
+
+    expired = threading.Event()
+    def on_timeout():
+        expired.set()
+        solver.interrupt()
+
+    timer = threading.Timer(timeout, on_timeout) if timeout else None
+    if timer:
+        timer.daemon = True
+        timer.start()
+    try:
+        outcome = solver.solve_limited(expect_interrupt=True) if interruptible else solver.solve()
+    finally:
+        if timer:
+            timer.cancel()
+    solving_time = time.time() - start_time
     
-    if solver.solve():
-        solving_time = time.time() - start_time
+    if outcome:
         print(f"\nSAT! Solution found in {solving_time:.2f}s!")
         print("Cost: 0 (all constraints satisfied)")
-        result = (0, solving_time)
-    else:
-        solving_time = time.time() - start_time
+        result = SolveResult(SAT, 0, solving_time, solver.get_model())
+    elif outcome is False:
         print(f"\nUNSAT! No solution exists. Search terminated in {solving_time:.2f}s.")
-        result = (None, solving_time)
+        result = SolveResult(UNSAT, None, solving_time)
+    elif expired.is_set():
+        print(f"\nTimeout reached after {solving_time:.2f}s")
+        result = SolveResult(TIMEOUT, None, solving_time)
+    else:
+        print(f"\nBudget exhausted after {solving_time:.2f}s without an answer")
+        result = SolveResult(UNKNOWN, None, solving_time)
+    result.stats = solver.accum_stats()
     
     solver.delete()
     return result
 
-def solve_maxsat_rc2(hard_clauses, soft_clauses_weighted, timeout=300):
+@dataclass
+class Improvement:
+    """Un modelo que mejora el mejor costo conocido (time en segundos desde el inicio)"""
+    cost: int
+    model: List[int]
+    time: float
+
+class SolverInterrupted(Exception):
+    """El timeout se cumplio durante una llamada al oracle de RC2"""
+
+class AnytimeMixin:
+    """
+    RC2 que se interrumpe desde otro hilo con interrupt() y guarda el mejor modelo del
+    oracle (upper bound); cada mejora se entrega a on_improvement como Improvement
+    """
+    def __init__(self, formula, soft_clauses_weighted, on_improvement=None, **kwargs):
+        self.deadline = threading.Event()
+        self.soft_clauses_weighted = soft_clauses_weighted
+        self.on_improvement = on_improvement
+        self.start_time = time.time()
+        self.best_model = None
+        self.best_cost = None
+        self.lower_bound = 0
+        super().__init__(formula, **kwargs)
+
+    def interrupt(self):
+        # el evento va antes que la interrupcion: si no esta activo, nada fue interrumpido
+        self.deadline.set()
+        super().interrupt()
+
+    def restart(self):
+        """Deja el solver listo para otro compute(): sin interrupcion pendiente ni incumbente"""
+        self.deadline = threading.Event()
+        self.oracle.clear_interrupt()
+        self.start_time = time.time()
+        self.best_model = None
+        self.best_cost = None
+        self.lower_bound = 0
+
+    def _call_oracle(self, assumptions=[], expect_interrupt=False):
+        if self.deadline.is_set():
+            raise SolverInterrupted()
+        self.lower_bound = self.cost
+        res = self.oracle.solve_limited(assumptions=assumptions, expect_interrupt=True)
+        if res is None and self.deadline.is_set():
+            # None sin deadline es el budget de conflictos de minimize_core
+            raise SolverInterrupted()
+        if res:
+            self.record_model(self.oracle.get_model())
+        return res
+
+    def warm_start(self, literals):
+        """
+        Fases del oracle desde un horario conocido (literales externos, ver assignment_literals).
+        Si el horario cumple las hard, el modelo que lo extiende queda como primer upper bound.
+        """
+        e2i = self.vmap.e2i
+        internal = [int(copysign(e2i[abs(l)], l)) for l in literals if abs(l) in e2i]
+        self.oracle.set_phases(internal)
+        res = self.oracle.solve_limited(assumptions=internal, expect_interrupt=True)
+        if res:
+            self.record_model(self.oracle.get_model())
+        elif res is None and self.deadline.is_set():
+            raise SolverInterrupted()
+
+    def record_model(self, model):
+        i2e = self.vmap.i2e
+        model = [int(copysign(i2e[abs(l)], l)) for l in model if abs(l) in i2e]
+        cost = soft_cost(self.soft_clauses_weighted, model)
+        if self.best_cost is None or cost < self.best_cost:
+            self.best_cost = cost
+            self.best_model = model
+            if self.on_improvement:
+                self.on_improvement(Improvement(cost, model, time.time() - self.start_time))
+
+@dataclass
+class StratumBound:
+    """Cotas al terminar un estrato: lower bound de RC2 y mejor costo visto hasta ese momento"""
+    weight: int
+    lower_bound: int
+    upper_bound: int
+    time: float
+
+class AnytimeRC2(AnytimeMixin, RC2Stratified):
+    """
+    RC2 estratificado interrumpible; thresholds (p.ej. (5, 2)) corta los estratos por peso y
+    cada estrato terminado queda como StratumBound en strata
+    """
+    def __init__(self, formula, soft_clauses_weighted, diversity=None, thresholds=None, on_stratum=None, **kwargs):
+        self.thresholds = sorted(thresholds or (), reverse=True)
+        self.on_stratum = on_stratum
+        self.strata = []
+        super().__init__(formula, soft_clauses_weighted, **kwargs)
+        if diversity is not None:
+            self.sdiv = diversity
+
+    def next_level(self):
+        if self.done:
+            self.record_stratum()
+        if not self.thresholds or self.levl >= len(self.blop):
+            return super().next_level()
+        threshold = next((t for t in self.thresholds if t <= self.blop[self.levl]), 0)
+        while self.levl < len(self.blop) - 1 and self.blop[self.levl + 1] >= threshold:
+            self.levl += 1
+
+    def compute(self, expect_interrupt=False):
+        # next_level solo ve los estratos que terminan antes de otro: el ultimo (o el que
+        # corta el timeout) se registra aca
+        try:
+            model = super().compute(expect_interrupt)
+        except SolverInterrupted:
+            self.record_stratum(final=True)
+            raise
+        if model is not None:
+            self.record_stratum(final=True)
+        return model
+
+    def record_stratum(self, final=False):
+        """Registra el estrato que termina: el anterior a levl, o el actual si final"""
+        level = len(self.blop) - 1 if self.levl is None else self.levl - (not final)
+        weight = self.blop[level] if 0 <= level < len(self.blop) else 0
+        bound = StratumBound(weight, self.cost, self.best_cost, time.time() - self.start_time)
+        self.strata.append(bound)
+        if self.on_stratum:
+            self.on_stratum(bound)
+
+class AnytimeRC2Plain(AnytimeMixin, RC2):
+    """RC2 sin estratificar interrumpible (solo entrega upper bound al terminar cada llamada SAT)"""
+
+def soft_cost(soft_clauses_weighted, model):
+    """Suma de los pesos (positivos) de las soft falsificadas por model"""
+    lits, offsets, weights = soft_clauses_weighted.arrays()
+    if len(lits) == 0:
+        return int(weights.clip(min=0).sum())
+    num_vars = soft_clauses_weighted.max_var()
+    model = np.asarray(model, dtype=np.int64)
+    values = np.zeros(num_vars + 1, dtype=bool)
+    values[model[(model > 0) & (model <= num_vars)]] = True
+    true_lits = values[np.abs(lits)] == (lits > 0)
+
+    satisfied = np.zeros(len(weights), dtype=bool)
+    nonempty = offsets[:-1] < offsets[1:]
+    satisfied[nonempty] = np.logical_or.reduceat(true_lits, offsets[:-1][nonempty])
+    return int(weights[~satisfied].clip(min=0).sum())
+
+def solve_maxsat_rc2(hard_clauses, soft_clauses_weighted, timeout=300, solver_name="g3", stratified=False,
+                     exhaust=True, blo="div", diversity=None, thresholds=None, on_improvement=None,
+                     phases=None):
     """
     Solver MaxSAT usando RC2 (core-based) para Secciones 4.1, 4.2, 4.4
     RC2 es un solver basado en unsatisfiable cores como describe el paper en Sección 2.3
+    Al cumplirse el timeout retorna el mejor modelo encontrado y el lower bound
     """
     print(f"Starting RC2 MaxSAT solver (timeout: {timeout}s)...")
     print(f"Hard clauses: {len(hard_clauses)}, Soft clauses: {len(soft_clauses_weighted)}")
     
-    filtered_soft = [(w, c) for w, c in soft_clauses_weighted if w > 0]
-    zero_weight = [(w, c) for w, c in soft_clauses_weighted if w == 0]
-    
+    zero_weight = int((soft_clauses_weighted.arrays()[2] == 0).sum())
     if zero_weight:
-        print(f"Warning: Found {len(zero_weight)} soft clauses with weight 0, moving to hard")
-        hard_clauses.extend([c for w, c in zero_weight])
+        print(f"Warning: Found {zero_weight} soft clauses with weight 0, moving to hard")
     
     start_time = time.time()
     
-    wcnf = WCNF()
-    
-    for clause in hard_clauses:
-        wcnf.append(clause)
-    
-    for weight, clause in filtered_soft:
-        wcnf.append(clause, weight=weight)
+    wcnf = buffers_to_wcnf(hard_clauses, soft_clauses_weighted)
     
     print(f"\nWCNF formula created: {wcnf.nv} variables, {len(wcnf.hard)} hard, {len(wcnf.soft)} soft")
     print("Starting RC2 optimization...\n")
     
+    def on_stratum(bound):
+        print(f"Stratum {len(solver.strata)} (weights >= {bound.weight}): lower bound {bound.lower_bound}, "
+              f"best cost {bound.upper_bound} at {bound.time:.2f}s", flush=True)
+
+    options = dict(on_improvement=on_improvement, solver=solver_name, adapt=True, exhaust=exhaust, minz=True, trim=5)
+    if stratified:
+        solver = AnytimeRC2(wcnf, soft_clauses_weighted, diversity, thresholds, on_stratum, blo=blo, **options)
+    else:
+        solver = AnytimeRC2Plain(wcnf, soft_clauses_weighted, **options)
+    timer = threading.Timer(timeout, solver.interrupt) if timeout else None
+    if timer:
+        timer.daemon = True
+        timer.start()
     try:
-        import signal
-        
-        def timeout_handler(signum, frame):
-            raise TimeoutError("RC2 solver timeout")
-        
-        try:
-            signal.signal(signal.SIGALRM, timeout_handler)
-            signal.alarm(timeout)
-        except:
-            print("Warning: Timeout not supported on this platform")
-        
-        with RC2(wcnf, solver='g3', adapt=True, exhaust=True, minz=True, trim=5) as solver:
-            model = solver.compute()
-            
-            try:
-                signal.alarm(0)
-            except:
-                pass
-            
-            if model is not None:
-                cost = solver.cost
-                elapsed = time.time() - start_time
-                print(f"\nOptimal solution found!")
-                print(f"Cost: {cost}")
-                print(f"Time: {elapsed:.2f}s")
-                return cost, elapsed
-            else:
-                elapsed = time.time() - start_time
-                print(f"\nUNSAT: No feasible solution exists")
-                print(f"Time: {elapsed:.2f}s")
-                return None, elapsed
-                
-    except TimeoutError:
+        if phases:
+            solver.warm_start(phases)
+            if solver.best_cost is not None:
+                print(f"Warm start cost: {solver.best_cost}")
+        model = solver.compute(expect_interrupt=True)
+        elapsed = time.time() - start_time
+        if model is not None:
+            print("\nOptimal solution found!")
+            print(f"Cost: {solver.cost}")
+            print(f"Time: {elapsed:.2f}s")
+            result = SolveResult(OPTIMUM, solver.cost, elapsed, model, lower_bound=solver.cost)
+        else:
+            print("\nUNSAT: No feasible solution exists")
+            print(f"Time: {elapsed:.2f}s")
+            result = SolveResult(UNSAT, None, elapsed)
+    except SolverInterrupted:
         elapsed = time.time() - start_time
         print(f"\nTimeout reached after {elapsed:.2f}s")
-        return None, elapsed
+        if solver.best_model is not None:
+            print(f"Best cost found: {solver.best_cost} (lower bound: {solver.lower_bound})")
+        result = SolveResult(TIMEOUT, solver.best_cost, elapsed, solver.best_model, lower_bound=solver.lower_bound)
     except Exception as e:
         elapsed = time.time() - start_time
         print(f"\nError during solving: {e}")
         print(f"Time: {elapsed:.2f}s")
-        return None, elapsed
+        result = SolveResult(UNKNOWN, None, elapsed)
+    finally:
+        if timer:
+            timer.cancel()
+
+    result.stats = solver.oracle.accum_stats() if solver.oracle else {}
+    result.strata = getattr(solver, "strata", None)
+    solver.delete()
+    return result
+
+# ============= LSU =============
+# niveles del contador de costo de LSU: los pesos se escalan para que el bound no pase de aqui
+LSU_LEVELS = 64
+
+def weighted_counter(literals, weights, bound, vpool):
+    """
+    Contador secuencial con pesos: retorna (clausulas, salidas) con salidas[b] forzada si la
+    suma de los pesos verdaderos supera b; el bound se impone asumiendo -salidas[b]
+    """
+    if not literals:
+        return ClauseBuffer(), None
+    top = bound + 1
+    lits = np.asarray(literals, dtype=np.int64)
+    weights = np.minimum(np.asarray(weights, dtype=np.int64), top)
+    table = np.arange(vpool.top + 1, vpool.top + 1 + len(lits) * top, dtype=np.int64).reshape(len(lits), top)
+    vpool.top += len(lits) * top
+
+    clauses = ClauseBuffer()
+    levels = np.arange(top)
+    # lit -> suma >= j + 1 para j < peso
+    i, j = np.nonzero(levels[None, :] < weights[:, None])
+    clauses.add_rows(np.stack([-lits[i], table[i, j]], axis=1))
+    # la suma de los i primeros se arrastra
+    clauses.add_rows(np.stack([-table[:-1].ravel(), table[1:].ravel()], axis=1))
+    # lit y suma previa >= j + 1 -> suma >= j + 1 + peso
+    i, j = np.nonzero(levels[None, :] < (top - weights[1:])[:, None])
+    i += 1
+    clauses.add_rows(np.stack([-lits[i], -table[i - 1, j], table[i, j + weights[i]]], axis=1))
+    return clauses, table[-1].tolist()
+
+class AnytimeLSU:
+    """
+    Busqueda lineal SAT-UNSAT (LSU) interrumpible para MaxSAT con pesos: cada llamada exige
+    costo menor que el mejor conocido, acotado con un weighted_counter sobre pesos escalados
+    """
+    def __init__(self, hard_clauses, soft_clauses_weighted, solver_name="g3", levels=LSU_LEVELS, phases=None):
+        self.phases = list(phases or [])
+        self.soft_clauses_weighted = soft_clauses_weighted
+        self.levels = levels
+        self.num_vars = max(hard_clauses.max_var(), soft_clauses_weighted.max_var())
+        self.vpool = IDPool(start_from=self.num_vars + 1)
+        self.oracle = Solver(name=solver_name)
+        for clauses in hard_clauses.iter_batches():
+            self.oracle.append_formula(clauses)
+
+        self.relaxation = []
+        self.weights = []
+        for weights, clauses in soft_clauses_weighted.iter_batches():
+            for weight, clause in zip(weights, clauses):
+                if weight == 0:
+                    self.oracle.add_clause(clause)
+                elif weight > 0 and len(clause) == 1:
+                    self.relaxation.append(-clause[0])
+                    self.weights.append(int(weight))
+                elif weight > 0:
+                    b = self.vpool.id()
+                    self.oracle.add_clause(list(clause) + [b])
+                    self.relaxation.append(b)
+                    self.weights.append(int(weight))
+        self.hardened = [False] * len(self.relaxation)
+
+        self.deadline = threading.Event()
+        self.status = UNKNOWN
+        self.best_cost = None
+        self.best_model = None
+        self.best_full_model = None
+        self.scale = None
+        self.selected = []
+        self.outputs = None
+
+    def interrupt(self):
+        self.deadline.set()
+        self.oracle.interrupt()
+
+    def _solve(self, assumptions):
+        if self.deadline.is_set():
+            return None
+        return self.oracle.solve_limited(assumptions=assumptions, expect_interrupt=True)
+
+    def ideal_scale(self, bound):
+        scale = 1
+        while bound // scale > self.levels:
+            scale *= 2
+        return scale
+
+    def build_counter(self, bound, scale):
+        """Nuevo contador para la escala dada; los contadores anteriores quedan sin asumir"""
+        self.selected = [i for i, w in enumerate(self.weights) if not self.hardened[i] and w // scale > 0]
+        clauses, self.outputs = weighted_counter([self.relaxation[i] for i in self.selected],
+                                                 [self.weights[i] // scale for i in self.selected],
+                                                 bound // scale, self.vpool)
+        for batch in clauses.iter_batches():
+            self.oracle.append_formula(batch)
+        self.scale = scale
+
+    def coarse_cost(self, model):
+        """Costo del modelo (completo, con las relajaciones) en los pesos escalados del contador"""
+        values = model_values(model, self.vpool.top)
+        return sum(self.weights[i] // self.scale for i in self.selected
+                   if values[abs(self.relaxation[i])] == (self.relaxation[i] > 0))
+
+    def improvements(self):
+        """Generador de Improvement; al terminar status queda en OPTIMUM, UNSAT o TIMEOUT"""
+        start_time = time.time()
+        # primera llamada guiada a satisfacer las soft (y por el horario inicial, si hay)
+        self.oracle.set_phases([-b for b in self.relaxation] + self.phases)
+        outcome = self._solve(self.phases) if self.phases else None
+        if not outcome and not self.deadline.is_set():
+            outcome = self._solve([])
+        exact = True
+        while outcome is not None:
+            refine = False
+            if outcome is False:
+                if exact:
+                    self.status = OPTIMUM if self.best_cost is not None else UNSAT
+                    return
+                refine = True
+            else:
+                full_model = self.oracle.get_model()
+                model = full_model[:self.num_vars]
+                cost = soft_cost(self.soft_clauses_weighted, model)
+                if self.best_cost is None or cost < self.best_cost:
+                    self.best_cost = cost
+                    self.best_model = model
+                    self.best_full_model = full_model
+                    self.oracle.set_phases(full_model)
+                    yield Improvement(cost, model, time.time() - start_time)
+                    if cost == 0:
+                        self.status = OPTIMUM
+                        return
+                elif self.scale > 1:
+                    # el bound escalado no alcanzo a excluir el modelo
+                    refine = True
+                else:
+                    raise RuntimeError("LSU cost bound did not exclude a non-improving model")
+
+            bound = self.best_cost - 1
+            for i, w in enumerate(self.weights):
+                if w > bound and not self.hardened[i]:
+                    self.oracle.add_clause([-self.relaxation[i]])
+                    self.hardened[i] = True
+            scale = self.ideal_scale(bound)
+            if refine:
+                self.build_counter(bound, min(scale, self.scale // 2))
+            elif self.scale is None or scale < self.scale:
+                self.build_counter(bound, scale)
+
+            target = necessary = bound // self.scale
+            coarse = self.coarse_cost(self.best_full_model)
+            if 0 < coarse <= necessary:
+                target = coarse - 1
+            exact = target == necessary
+            outcome = self._solve([-self.outputs[target]] if self.outputs else [])
+        self.status = TIMEOUT
+
+    def delete(self):
+        if self.oracle:
+            self.oracle.delete()
+            self.oracle = None
+
+def solve_maxsat_lsu(hard_clauses, soft_clauses_weighted, timeout=300, solver_name="g3", on_improvement=None,
+                     phases=None):
+    """
+    Solver MaxSAT anytime con LSU (ver AnytimeLSU)
+    Al timeout retorna el mejor modelo encontrado, sin lower bound
+    """
+    print(f"Starting LSU MaxSAT solver (timeout: {timeout}s)...")
+    print(f"Hard clauses: {len(hard_clauses)}, Soft clauses: {len(soft_clauses_weighted)}")
+    start_time = time.time()
+
+    solver = AnytimeLSU(hard_clauses, soft_clauses_weighted, solver_name, phases=phases)
+    timer = threading.Timer(timeout, solver.interrupt) if timeout else None
+    if timer:
+        timer.daemon = True
+        timer.start()
+    try:
+        for improvement in solver.improvements():
+            print(f"  cost {improvement.cost} at {improvement.time:.2f}s (scale {solver.scale or 1})", flush=True)
+            if on_improvement:
+                on_improvement(improvement)
+    finally:
+        if timer:
+            timer.cancel()
+    elapsed = time.time() - start_time
+
+    if solver.status == OPTIMUM:
+        print("\nOptimal solution found!")
+        print(f"Cost: {solver.best_cost}")
+        result = SolveResult(OPTIMUM, solver.best_cost, elapsed, solver.best_model, lower_bound=solver.best_cost)
+    elif solver.status == UNSAT:
+        print("\nUNSAT: No feasible solution exists")
+        result = SolveResult(UNSAT, None, elapsed)
+    else:
+        print(f"\nTimeout reached after {elapsed:.2f}s")
+        if solver.best_model is not None:
+            print(f"Best cost found: {solver.best_cost}")
+        result = SolveResult(TIMEOUT, solver.best_cost, elapsed, solver.best_model)
+    print(f"Time: {elapsed:.2f}s")
+    result.stats = solver.oracle.accum_stats()
+    solver.delete()
+    return result
+
+# ============= PORTFOLIO =============
+@dataclass
+class SolverConfig:
+    name: str
+    solver: str = "g3"
+    stratified: bool = True
+    exhaust: bool = True
+    blo: str = "div"
+    thresholds: Tuple[int, ...] = None
+    algorithm: str = "rc2"
+
+SAT_PORTFOLIO = [
+    SolverConfig("glucose3", "g3"),
+    SolverConfig("glucose4", "g4"),
+    SolverConfig("cadical", "cadical195"),
+    SolverConfig("maplechrono", "maplechrono"),
+]
+MAXSAT_PORTFOLIO = [
+    SolverConfig("rc2s-glucose3", "g3"),
+    SolverConfig("rc2-glucose3", "g3", stratified=False),
+    SolverConfig("rc2s-glucose4-noexhaust", "g4", exhaust=False),
+    SolverConfig("rc2-maplechrono-noexhaust", "maplechrono", stratified=False, exhaust=False),
+    SolverConfig("rc2s-glucose3-strata", "g3", thresholds=(MIN_WORKING_DAYS_WEIGHT, 2)),
+    SolverConfig("lsu-glucose3", "g3", algorithm="lsu"),
+]
+# margen para que los procesos entreguen su mejor resultado despues del timeout
+PORTFOLIO_GRACE = 10
+
+
+def portfolio_worker(config, hard_clauses, soft_clauses_weighted, timeout, sat, phases, queue, forward=False):
+    """Corre una configuracion; con forward cada Improvement tambien va a queue"""
+    sys.stdout = open(os.devnull, "w")
+    on_improvement = queue.put if forward else None
+    try:
+        if sat:
+            result = solve_sat(hard_clauses, timeout, solver_name=config.solver, phases=phases)
+        elif config.algorithm == "lsu":
+            result = solve_maxsat_lsu(hard_clauses, soft_clauses_weighted, timeout, config.solver,
+                                      on_improvement=on_improvement, phases=phases)
+        else:
+            result = solve_maxsat_rc2(hard_clauses, soft_clauses_weighted, timeout, config.solver,
+                                      config.stratified, config.exhaust, config.blo, thresholds=config.thresholds,
+                                      on_improvement=on_improvement, phases=phases)
+    except Exception as e:
+        result = SolveResult(UNKNOWN, stats={"error": str(e)})
+    result.solver = config.name
+    queue.put(result)
+
+def solve_portfolio(hard_clauses, soft_clauses_weighted, timeout=300, configs=None, sat=False, phases=None,
+                    on_improvement=None):
+    """
+    Corre varias configuraciones de solver en procesos paralelos y retorna la primera prueba
+    (SAT/UNSAT/OPTIMUM); si nadie termina, el menor costo y el mayor lower bound
+    """
+    configs = [c for c in (configs or (SAT_PORTFOLIO if sat else MAXSAT_PORTFOLIO)) if solver_family(c.solver)]
+    print(f"Starting portfolio (timeout: {timeout}s): {', '.join(c.name for c in configs)}")
+    start_time = time.time()
+
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    processes = [context.Process(target=portfolio_worker, daemon=True,
+                                 args=(c, hard_clauses, soft_clauses_weighted, timeout, sat, phases, queue,
+                                       on_improvement is not None))
+                 for c in configs]
+    for process in processes:
+        process.start()
+
+    results = []
+    winner = None
+    best_cost = None
+    deadline = start_time + timeout + PORTFOLIO_GRACE
+    # los solvers sin interrupt no responden al timeout: pasado este no se los espera
+    interruptible = sum(solver_interruptible(c.solver) for c in configs)
+    while len(results) < len(processes) and time.time() < deadline:
+        if time.time() > start_time + timeout and len(results) >= interruptible:
+            break
+        try:
+            result = queue.get(timeout=min(1, max(0.01, deadline - time.time())))
+        except Exception:
+            if not any(p.is_alive() for p in processes) and queue.empty():
+                break
+            continue
+        if isinstance(result, Improvement):
+            if best_cost is None or result.cost < best_cost:
+                best_cost = result.cost
+                on_improvement(result)
+            continue
+        results.append(result)
+        print(f"  {result.solver}: {result.status} cost={result.cost} ({result.time:.2f}s)")
+        if result.status in (SAT, UNSAT, OPTIMUM):
+            winner = result
+            break
+
+    for process in processes:
+        if process.is_alive():
+            process.kill()
+        process.join()
+
+    elapsed = time.time() - start_time
+    if winner is None:
+        solved = [r for r in results if r.cost is not None]
+        bounds = [r.lower_bound for r in results if r.lower_bound is not None]
+        winner = min(solved, key=lambda r: r.cost) if solved else SolveResult(TIMEOUT)
+        winner.status = TIMEOUT
+        winner.lower_bound = max(bounds) if bounds else None
+    winner.time = elapsed
+    print(f"Portfolio finished in {elapsed:.2f}s: {winner.status} by {winner.solver or '-'}")
+    return winner
+
+# ============= SOLUCIONES =============
+def model_values(model, num_vars):
+    """Arreglo booleano values[v] = v es verdadera en model (v <= num_vars; values[0] es False)"""
+    model = np.asarray(model if model is not None else [], dtype=np.int64)
+    values = np.zeros(num_vars + 1, dtype=bool)
+    values[model[(model > 0) & (model <= num_vars)]] = True
+    return values
+
+def decode_model(layout, model):
+    """
+    Traduce un modelo a la lista de clases [(curso, dia, periodo, sala), ...] ordenada por
+    curso y hora; la sala sale de chr (Sección 4.4) o de cr
+    """
+    values = model_values(model, layout.top)
+    ch_true = values[layout.ch]
+    if layout.chr is not None:
+        room_true = values[layout.chr]
+    else:
+        cr_true = values[layout.cr]
+        room_true = np.broadcast_to(cr_true[:, None, :], (len(cr_true), layout.num_hours, cr_true.shape[1]))
+    has_room = room_true.any(axis=2)
+    missing = ch_true & ~has_room
+    if missing.any():
+        ci, h = np.argwhere(missing)[0]
+        raise ValueError(f"Model assigns no room to course {layout.course_ids[ci]} at hour {h}")
+
+    ci, h = np.nonzero(ch_true)
+    ri = room_true[ci, h].argmax(axis=1)
+    ppd = layout.num_hours // layout.num_days
+    assignments = [(layout.course_ids[c], hour // ppd, hour % ppd, layout.room_ids[r])
+                   for c, hour, r in zip(ci.tolist(), h.tolist(), ri.tolist())]
+    if layout.room_groups is not None:
+        assignments = assign_rooms(layout.room_groups, assignments)
+    return assignments
+
+def assign_rooms(room_groups, assignments):
+    """
+    Reemplaza la clase de sala de cada clase por una sala libre de esa clase (modo 4.4c),
+    prefiriendo las que el curso ya usa; puede tener que cambiar de sala dentro de la clase
+    """
+    by_class = {}
+    for i, (course, d, period, q) in enumerate(assignments):
+        by_class.setdefault(q, {}).setdefault(course, []).append(i)
+
+    rooms_of = [None] * len(assignments)
+    for q, course_lectures in by_class.items():
+        members = room_groups[q]
+        occupied = {r_id: set() for r_id in members}
+        for course, lectures in sorted(course_lectures.items(), key=lambda item: -len(item[1])):
+            slots = [assignments[i][1:3] for i in lectures]
+            home = next((r_id for r_id in members if occupied[r_id].isdisjoint(slots)), None)
+            used = []
+            for i, slot in zip(lectures, slots):
+                free = [r_id for r_id in ([home] if home is not None else used + members) if slot not in occupied[r_id]]
+                if not free:
+                    raise ValueError(f"More lectures than rooms in class {q} at day {slot[0]} period {slot[1]}")
+                occupied[free[0]].add(slot)
+                rooms_of[i] = free[0]
+                if free[0] not in used:
+                    used.append(free[0])
+    return [(course, d, period, room) for (course, d, period, _), room in zip(assignments, rooms_of)]
+
+def assignment_literals(layout, assignments):
+    """
+    Inverso de decode_model: un literal por cada variable estructural que deja el horario
+    [(curso, dia, periodo, sala), ...], positivo si la clase lo usa (fases del solver)
+    """
+    num_courses, num_rooms = len(layout.course_ids), len(layout.room_ids)
+    ppd = layout.num_hours // layout.num_days
+    room_index = layout.room_pos
+    if layout.room_groups is not None:
+        room_index = {r: qi for qi, members in enumerate(layout.room_groups.values()) for r in members}
+    ch = np.zeros((num_courses, layout.num_hours), dtype=bool)
+    cr = np.zeros((num_courses, num_rooms), dtype=bool)
+    chr_true = np.zeros((num_courses, layout.num_hours, num_rooms), dtype=bool)
+    for course, d, period, room in assignments:
+        if course not in layout.course_pos or room not in room_index:
+            raise ValueError(f"Unknown course or room in assignment: {course} {room}")
+        ci, h, ri = layout.course_pos[course], d * ppd + period, room_index[room]
+        ch[ci, h] = cr[ci, ri] = chr_true[ci, h, ri] = True
+    cd = ch.reshape(num_courses, layout.num_days, ppd).any(axis=2)
+    kh = np.array([ch[members].any(axis=0) for members in layout.curriculum_courses],
+                  dtype=bool).reshape(len(layout.curriculum_courses), layout.num_hours)
+
+    literals = []
+    for table, truth in ((layout.ch, ch), (layout.cd, cd), (layout.cr, cr), (layout.kh, kh), (layout.chr, chr_true)):
+        if table is not None:
+            mask = table != 0
+            literals.append(np.where(truth[mask], table[mask], -table[mask]))
+    return np.concatenate(literals).tolist()
+
+def write_solution(path, assignments):
+    """Escribe las clases en formato .sol de ITC2007 ('CourseID RoomID Day Period'), con rename atomico"""
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w") as f:
+        f.writelines(f"{course} {room} {d} {period}\n" for course, d, period, room in assignments)
+    os.replace(tmp, path)
+
+# ============= RESOLUCIÓN INCREMENTAL =============
+# Familias que dependen de lo que se puede editar sin re-codificar (indisponibilidades,
+# capacidad de salas / alumnos por curso y profesor de cada curso). IncrementalTimetable
+# las reemplaza por grupos de clausulas con selector.
+INCREMENTAL_FAMILIES = (room_capacity_soft_chr, course_clashes)
+
+def incremental_index(instance):
+    """
+    InstanceIndex sin indisponibilidades y con conflictos solo por curriculum: ninguna
+    clausula base depende de lo que se puede editar
+    """
+    index = build_index(replace(instance, unavailabilities=[]))
+    return replace(index, conflicts=conflict_graph(instance.courses, instance.curricula, teachers=False))
+
+def instance_structure(instance):
+    """Lo que IncrementalTimetable no sabe editar: si cambia, se reconstruye todo"""
+    return (instance.num_days, instance.periods_per_day,
+            [(c_id, course.num_lectures, course.min_working_days) for c_id, course in instance.courses.items()],
+            list(instance.rooms),
+            {k: set(curr.courses) for k, curr in instance.curricula.items()})
+
+@dataclass
+class ConstraintGroup:
+    """
+    Clausulas de una restriccion del mundo real. clauses van sin selector (formula para RC2)
+    y guarded son las mismas con el/los selectores negados, para el solver SAT persistente.
+    """
+    spec: object
+    kind: str
+    clauses: list
+    selector: int = 0
+    guarded: list = None
+
+@dataclass
+class InstanceDelta:
+    added: List[tuple] = field(default_factory=list)
+    removed: List[tuple] = field(default_factory=list)
+    rebuilt: bool = False
+
+# Restricciones que query() puede suponer sin que esten en la instancia
+HYPOTHESES = ("unavailable", "room_closed")
+
+class IncrementalTimetable:
+    """
+    Encoding de una seccion que se mantiene vivo entre ediciones: cada restriccion editable
+    ('unavailable', 'capacity' o 'teacher') es un grupo de clausulas con su selector
+    """
+    def __init__(self, instance, mode="3", solver_name="g3"):
+        if mode not in SECTIONS:
+            raise ValueError(f"Unknown mode: {mode}")
+        if SECTIONS[mode][1].get("room_classes"):
+            raise ValueError(f"Mode {mode} groups rooms into classes and cannot be solved incrementally")
+        self.mode = mode
+        self.solver_name = solver_name
+        self.solver = None
+        self.rc2 = None
+        self._build(instance)
+
+    def _build(self, instance):
+        self.delete()
+        families, layout_options = SECTIONS[self.mode]
+        index = incremental_index(instance)
+        self.layout = VarLayout(instance, index, capacity_hard=False, with_chr=layout_options.get("with_chr", False))
+        self.vpool = IDPool(start_from=self.layout.top + 1)
+        specs = [spec for spec in families(instance, self.layout, index, self.vpool, "pairwise")
+                 if spec[1] not in INCREMENTAL_FAMILIES]
+        specs.append((HARD, curriculum_clashes, (self.layout,)))
+        self.hard_clauses = ClauseBuffer()
+        self.soft_clauses_weighted = ClauseBuffer(weighted=True)
+        for kind, clauses in generate_families(specs):
+            (self.hard_clauses if kind == HARD else self.soft_clauses_weighted).extend(clauses)
+
+        self.instance = instance
+        self.structure = instance_structure(instance)
+        self.groups = {}
+        self.hypotheses = {}
+        self.selector_keys = {}
+        self.model = None
+        self.rc2_stale = True
+        self._apply(self.group_specs(instance))
+
+    def group_specs(self, instance):
+        """clave -> descripcion de cada grupo; dos grupos con la misma descripcion son iguales"""
+        specs = {}
+        for u in instance.unavailabilities:
+            if u.course_id in self.layout.course_pos:
+                specs[("unavailable", u.course_id, u.day, u.day_period)] = None
+        for c_id, course in instance.courses.items():
+            for r_id, room in instance.rooms.items():
+                if course.num_students > room.capacity:
+                    specs[("capacity", c_id, r_id)] = course.num_students - room.capacity
+        # la descripcion incluye a los demas cursos del profesor: si uno cambia de profesor
+        # se rehacen los grupos de todos los cursos involucrados
+        teachers = map_teacher(instance.courses)
+        for c_id, course in instance.courses.items():
+            if len(teachers[course.teacher]) > 1:
+                specs[("teacher", c_id)] = (course.teacher, frozenset(teachers[course.teacher]))
+        return specs
+
+    def group_clauses(self, key, spec, selector):
+        """Retorna (HARD/SOFT, clausulas, clausulas guardadas por selector)"""
+        layout = self.layout
+        if key[0] == "capacity":
+            ci, ri = layout.course_pos[key[1]], layout.room_pos[key[2]]
+            if layout.chr is not None:
+                return SOFT, [(spec, [-v]) for v in layout.chr[ci, :, ri].tolist()], None
+            clauses = [[-int(layout.cr[ci, ri])]]
+        elif key[0] == "teacher":
+            # cada choque queda en el grupo del curso que va despues en la instancia y se guarda
+            # con los selectores de ambos cursos, asi un core nombra las dos asignaciones
+            ci = layout.course_pos[key[1]]
+            clauses, guarded = [], []
+            for c_id in spec[1]:
+                cj = layout.course_pos[c_id]
+                if cj >= ci:
+                    continue
+                rows = pair_clashes(layout.ch, [cj, ci]).tolist()
+                partner = self.groups[("teacher", c_id)].selector
+                clauses.extend(rows)
+                guarded.extend(row + [-partner, -selector] for row in rows)
+            return HARD, clauses, guarded
+        else:
+            clauses = self.hypothesis_clauses(key)
+        return HARD, clauses, [clause + [-selector] for clause in clauses]
+
+    def hypothesis_clauses(self, key):
+        """Clausulas de ('unavailable', curso, dia, periodo) o ('room_closed', sala, dia)"""
+        layout = self.layout
+        ppd = self.instance.periods_per_day
+        names = layout.course_pos if key[0] == "unavailable" else layout.room_pos
+        if key[0] in HYPOTHESES and key[1] not in names:
+            raise ValueError(f"Unknown {'course' if key[0] == 'unavailable' else 'room'} in {key!r}")
+        if key[0] in HYPOTHESES and not 0 <= key[2] < self.instance.num_days:
+            raise ValueError(f"Day {key[2]} out of range 0..{self.instance.num_days - 1} in {key!r}")
+        if key[0] == "unavailable" and not 0 <= key[3] < ppd:
+            raise ValueError(f"Period {key[3]} out of range 0..{ppd - 1} in {key!r}")
+        if key[0] == "unavailable":
+            return [[-int(layout.ch[layout.course_pos[key[1]], key[2] * ppd + key[3]])]]
+        if key[0] == "room_closed":
+            ri = layout.room_pos[key[1]]
+            hours = range(key[2] * ppd, (key[2] + 1) * ppd)
+            if layout.chr is not None:
+                return [[-v] for v in layout.chr[:, hours, ri].reshape(-1).tolist()]
+            # con room stability hard el curso usa una sola sala: sala r y algun dia d -> r abierta en d
+            return np.stack([-layout.cr[:, ri], -layout.cd[:, key[2]]], axis=1).tolist()
+        raise ValueError(f"Unknown constraint {key!r} (expected one of {', '.join(HYPOTHESES)})")
+
+    def update(self, instance):
+        """Lleva el encoding (y los solvers vivos) a la nueva instancia; retorna InstanceDelta"""
+        if instance_structure(instance) != self.structure:
+            self._build(instance)
+            return InstanceDelta(added=list(self.groups), rebuilt=True)
+        self.instance = instance
+        return self._apply(self.group_specs(instance))
+
+    def _apply(self, specs):
+        delta = InstanceDelta()
+        for key, group in list(self.groups.items()):
+            if key not in specs or specs[key] != group.spec:
+                del self.groups[key]
+                delta.removed.append(key)
+                if group.selector and self.solver:
+                    self.solver.add_clause([-group.selector])
+                self.rc2_stale = True
+
+        for key, spec in specs.items():
+            if key in self.groups:
+                continue
+            selector = self.vpool.id()
+            kind, clauses, guarded = self.group_clauses(key, spec, selector)
+            group = ConstraintGroup(spec, kind, clauses, selector if kind == HARD else 0, guarded)
+            self.groups[key] = group
+            delta.added.append(key)
+            if kind == SOFT:
+                self.rc2_stale = True
+                continue
+            self.selector_keys[selector] = key
+            if self.solver:
+                self.solver.append_formula(guarded)
+            if self.rc2 and not self.rc2_stale:
+                for clause in clauses:
+                    self.rc2.add_clause(clause)
+        return delta
+
+    def formula(self):
+        """(hard, soft) actuales: la base mas las clausulas de los grupos activos, sin selectores"""
+        hard_clauses, soft_clauses_weighted = ClauseBuffer(), ClauseBuffer(weighted=True)
+        hard_clauses.extend(self.hard_clauses)
+        soft_clauses_weighted.extend(self.soft_clauses_weighted)
+        for group in self.groups.values():
+            (hard_clauses if group.kind == HARD else soft_clauses_weighted).extend(group.clauses)
+        return hard_clauses, soft_clauses_weighted
+
+    def sat_solver(self):
+        """Solver SAT persistente con las hard base y las de cada grupo guardadas por su selector"""
+        if self.solver is None:
+            self.solver = Solver(name=self.solver_name)
+            for clauses in self.hard_clauses.iter_batches():
+                self.solver.append_formula(clauses)
+            for group in list(self.groups.values()) + list(self.hypotheses.values()):
+                if group.kind == HARD:
+                    self.solver.append_formula(group.guarded)
+        return self.solver
+
+    def assumptions(self):
+        return [group.selector for group in self.groups.values() if group.selector]
+
+    def solve(self, timeout=300):
+        """Resuelve la instancia actual (SAT o MaxSAT segun el modo) y retorna SolveResult"""
+        if self.mode == "3":
+            result = self.solve_sat(self.assumptions(), timeout)
+            if result.model:
+                self.model = result.model
+            return result
+        return self.solve_maxsat(timeout)
+
+    def solve_sat(self, assumptions, timeout=300):
+        """Una llamada al solver SAT persistente bajo assumptions (solo hard)"""
+        solver = self.sat_solver()
+        start_time = time.time()
+        expired = threading.Event()
+        def on_timeout():
+            expired.set()
+            solver.interrupt()
+
+        timer = threading.Timer(timeout, on_timeout) if timeout else None
+        if timer:
+            timer.daemon = True
+            timer.start()
+        try:
+            outcome = solver.solve_limited(assumptions=assumptions, expect_interrupt=True)
+        finally:
+            if timer:
+                timer.cancel()
+        solver.clear_interrupt()
+        elapsed = time.time() - start_time
+
+        if outcome:
+            return SolveResult(SAT, 0, elapsed, solver.get_model(), solver=self.solver_name)
+        if outcome is False:
+            return SolveResult(UNSAT, None, elapsed, solver=self.solver_name, core=solver.get_core() or [])
+        return SolveResult(TIMEOUT, None, elapsed, solver=self.solver_name)
+
+    def hypothesis(self, key):
+        """Grupo (inactivo salvo que se asuma) de una restriccion hipotetica; se crea una sola vez"""
+        if key in self.groups:
+            return self.groups[key]
+        if key not in self.hypotheses:
+            selector = self.vpool.id()
+            clauses = self.hypothesis_clauses(key)
+            group = ConstraintGroup(None, HARD, clauses, selector, [clause + [-selector] for clause in clauses])
+            self.hypotheses[key] = group
+            self.selector_keys[selector] = key
+            if self.solver:
+                self.solver.append_formula(group.guarded)
+        return self.hypotheses[key]
+
+    def query(self, constraints=(), without=(), timeout=10, minimize=True):
+        """
+        ¿Se pueden cumplir las hard agregando constraints (claves de HYPOTHESES) y quitando los
+        grupos en without? Si no, result.core son las claves de las restricciones en conflicto
+        """
+        start_time = time.time()
+        without = set(without)
+        assumptions = [group.selector for key, group in self.groups.items()
+                       if group.selector and key not in without]
+        assumptions.extend(self.hypothesis(key).selector for key in constraints)
+        result = self.solve_sat(assumptions, timeout)
+        if result.status == UNSAT:
+            core = result.core
+            if minimize:
+                core = self.minimize_core(core, deadline=time.time() + timeout)
+            result.core = [self.selector_keys[s] for s in core]
+            result.time = time.time() - start_time
+        return result
+
+    def minimize_core(self, core, conf_budget=1000, deadline=None):
+        """Quita del core los selectores que no hacen falta (cada prueba limitada por conf_budget)"""
+        solver = self.sat_solver()
+        core = list(core)
+        i = 0
+        while i < len(core):
+            if deadline and time.time() > deadline:
+                break
+            candidate = core[:i] + core[i + 1:]
+            solver.conf_budget(conf_budget)
+            if solver.solve_limited(assumptions=candidate) is False:
+                reduced = set(solver.get_core() or [])
+                core = [s for s in candidate if s in reduced]
+            else:
+                i += 1
+        solver.conf_budget(-1)
+        return core
+
+    def solve_maxsat(self, timeout=300):
+        start_time = time.time()
+        if self.rc2 is None or self.rc2_stale:
+            if self.rc2:
+                self.rc2.delete()
+            hard_clauses, soft_clauses_weighted = self.formula()
+            self.rc2 = AnytimeRC2(buffers_to_wcnf(hard_clauses, soft_clauses_weighted), soft_clauses_weighted,
+                                  solver=self.solver_name, adapt=True, exhaust=True, minz=True, trim=5)
+            if self.model:
+                self.rc2.oracle.set_phases(self.model)
+            self.rc2_stale = False
+        else:
+            self.rc2.restart()
+
+        rc2 = self.rc2
+        timer = threading.Timer(timeout, rc2.interrupt) if timeout else None
+        if timer:
+            timer.daemon = True
+            timer.start()
+        try:
+            model = rc2.compute(expect_interrupt=True)
+        except SolverInterrupted:
+            # el RC2 quedo a mitad de una iteracion: el proximo solve lo reconstruye
+            self.rc2_stale = True
+            if rc2.best_model is not None:
+                self.model = rc2.best_model
+            return SolveResult(TIMEOUT, rc2.best_cost, time.time() - start_time, rc2.best_model,
+                               lower_bound=rc2.lower_bound, solver=self.solver_name)
+        finally:
+            if timer:
+                timer.cancel()
+        elapsed = time.time() - start_time
+        if model is None:
+            return SolveResult(UNSAT, None, elapsed, solver=self.solver_name)
+        self.model = model
+        return SolveResult(OPTIMUM, rc2.cost, elapsed, model, lower_bound=rc2.cost, solver=self.solver_name)
+
+    def assignments(self, model=None):
+        """Clases (curso, dia, periodo, sala) del modelo dado o del ultimo encontrado"""
+        return decode_model(self.layout, self.model if model is None else model)
+
+    def delete(self):
+        if self.solver:
+            self.solver.delete()
+            self.solver = None
+        if self.rc2:
+            self.rc2.delete()
+            self.rc2 = None
 
 # ============= MAIN =============
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Curriculum-based course timetabling with SAT and MaxSAT",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="Modes:\n"
+               "  3   - Section 3: Basic SAT (all hard)\n"
+               "  4.1 - Section 4.1: Partial MaxSAT (isolated lectures soft)\n"
+               "  4.2 - Section 4.2: Weighted Partial MaxSAT (isolated + min days soft)\n"
+               "  4.4 - Section 4.4: Complete encoding (all soft)\n"
+               "  4.4c - Section 4.4 relaxed to rooms grouped by capacity (rooms assigned after solving,\n"
+               "         the solver cost is a lower bound of the timetable cost)"
+    )
+    parser.add_argument("input_file", help="instance file in ITC2007 .ctt format")
+    parser.add_argument("mode", nargs="?", default="4.4", help="encoding section (default: 4.4)")
+    parser.add_argument("timeout", nargs="?", type=int, default=300, help="solver timeout in seconds (default: 300)")
+    parser.add_argument("--clash-encoding", choices=CLASH_ENCODINGS, default="pairwise",
+                        help="curriculum/teacher clash encoding (default: pairwise)")
+    parser.add_argument("--no-normalize", dest="normalize", action="store_false",
+                        help="skip clause deduplication/subsumption before solving")
+    parser.add_argument("--cache-dir", default=None,
+                        help="reuse encodings stored in this directory (keyed by instance content and mode)")
+    parser.add_argument("--cache-size-mb", type=int, default=2048,
+                        help="evict least recently used cache entries above this size (default: 2048)")
+    parser.add_argument("--formula", metavar="FILE",
+                        help=f"solve (or export) the binary formula in FILE ({FORMULA_SUFFIX}) instead of encoding")
+    parser.add_argument("--save-formula", metavar="FILE",
+                        help=f"also write the (normalized) formula to the binary FILE ({FORMULA_SUFFIX})")
+    parser.add_argument("--solution", metavar="FILE",
+                        help="write the best timetable found to FILE in ITC2007 .sol format "
+                             "(rewritten on every improvement while solving)")
+    parser.add_argument("--export", metavar="FILE",
+                        help=f"stream the formula to FILE (.cnf/.wcnf, optionally .gz/.zst, or {FORMULA_SUFFIX}) "
+                             f"instead of solving")
+    parser.add_argument("--wcnf-format", choices=["new", "old"], default="new",
+                        help="WCNF flavour for --export: 'new' (h/weight lines) or 'old' (p wcnf header) (default: new)")
+    parser.add_argument("--portfolio", action="store_true",
+                        help="race several solver configurations in parallel processes")
+    parser.add_argument("--maxsat", choices=MAXSAT_ALGORITHMS, default="rc2",
+                        help="MaxSAT algorithm: core-guided RC2 or anytime linear search LSU (default: rc2)")
+    parser.add_argument("--warm-start", type=float, default=0, metavar="SECONDS",
+                        help="build an initial timetable with the greedy/tabu heuristic for this many seconds and "
+                             "use it as solver phases and first upper bound (default: off)")
+    parser.add_argument("--blo", choices=BLO_STRATEGIES, default="div",
+                        help="RC2 stratification strategy (default: div)")
+    parser.add_argument("--diversity", type=float, default=None,
+                        help="diversity threshold for 'div' stratification (default: half the distinct weights)")
+    parser.add_argument("--strata", type=int, nargs="+", default=None, metavar="WEIGHT",
+                        help="cut RC2 strata at these weights instead of --blo (e.g. '--strata 5 2')")
+    parser.add_argument("--conf-budget", type=int, default=None,
+                        help="stop the SAT solver (Section 3) after this many conflicts")
+    parser.add_argument("--prop-budget", type=int, default=None,
+                        help="stop the SAT solver (Section 3) after this many propagations")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python complete_paper_encoder.py <file.ctt> <mode> [timeout]")
-        print("\nModes:")
-        print("  3  - Section 3: Basic SAT (all hard)")
-        print("  4.1 - Section 4.1: Partial MaxSAT (isolated lectures soft)")
-        print("  4.2 - Section 4.2: Weighted Partial MaxSAT (isolated + min days soft)")
-        print("  4.4 - Section 4.4: Complete encoding (all soft)")
-        sys.exit(1)
-    
-    input_file = sys.argv[1]
-    mode = sys.argv[2] if len(sys.argv) > 2 else "4.4"
-    timeout = int(sys.argv[3]) if len(sys.argv) > 3 else 300
+    args = parse_args(sys.argv[1:])
+    input_file = args.input_file
+    mode = args.mode
+    timeout = args.timeout
     
     print(f"{'='*70}")
     print(f"Curriculum-based Course Timetabling with SAT and MaxSAT")
@@ -807,6 +2720,7 @@ if __name__ == "__main__":
     print(f"File: {input_file}")
     print(f"Mode: Section {mode}")
     print(f"Timeout: {timeout}s")
+    print(f"Clash encoding: {args.clash_encoding}")
     print(f"{'='*70}\n")
 
     instance = parse_ctt(input_file)
@@ -821,40 +2735,142 @@ if __name__ == "__main__":
     print()
     
     start_time = time.time()
+
+    if args.export and not args.formula:
+        if mode not in SECTIONS:
+            print(f"Unknown mode: {mode}")
+            sys.exit(1)
+        print(f"Exporting Section {mode} to {args.export} (streaming, not normalized)...")
+        try:
+            stats = export_formula(mode, instance, args.export, args.wcnf_format, clash_encoding=args.clash_encoding)
+        except (ValueError, RuntimeError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        print(f"Wrote {stats.num_hard} hard and {stats.num_soft} soft clauses over {stats.num_vars} variables "
+              f"in {time.time() - start_time:.2f}s ({stats.passes} pass{'es' if stats.passes > 1 else ''}).")
+        sys.exit(0)
     
-    if mode == "3":
-        print("Encoding Section 3: Basic SAT (all constraints hard)...")
-        hard_clauses, soft_clauses_weighted, vpool = encode_section_3(instance)
-    elif mode == "4.1":
-        print("Encoding Section 4.1: Partial MaxSAT (isolated lectures soft)...")
-        hard_clauses, soft_clauses_weighted, vpool = encode_section_4_1(instance)
-    elif mode == "4.2":
-        print("Encoding Section 4.2: Weighted Partial MaxSAT (isolated + min days soft)...")
-        hard_clauses, soft_clauses_weighted, vpool = encode_section_4_2(instance)
-    elif mode == "4.4":
-        print("Encoding Section 4.4: Complete encoding (all soft)...")
-        hard_clauses, soft_clauses_weighted, vpool = encode_section_4_4(instance)
-    else:
+    if mode not in SECTIONS:
         print(f"Unknown mode: {mode}")
         sys.exit(1)
+
+    cache = EncodingCache(args.cache_dir, args.cache_size_mb * 1024 * 1024) if args.cache_dir else None
+    cache_key = cache.key(input_file, mode, args.clash_encoding, args.normalize) if cache else None
+    cached = cache.load(cache_key) if cache and not args.formula else None
+    if args.formula:
+        print(f"Loading formula from {args.formula}...")
+        try:
+            hard_clauses, soft_clauses_weighted, num_vars = read_formula(args.formula)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        vpool, layout = IDPool(start_from=num_vars + 1), None
+    elif cached:
+        print(f"Loading Section {mode} encoding from cache ({cache_key})...")
+        hard_clauses, soft_clauses_weighted, vpool, layout = cached
+    else:
+        print(f"Encoding Section {mode}: {SECTION_TITLES[mode]}...")
+        hard_clauses, soft_clauses_weighted, vpool, layout = encode_with_layout(
+            mode, instance, clash_encoding=args.clash_encoding)
     
     encoding_time = time.time() - start_time
     
     print(f"Generated {len(hard_clauses)} hard and {len(soft_clauses_weighted)} soft clauses in {encoding_time:.2f}s.")
     print(f"Total variables: {vpool.top}")
+
+    if args.normalize and not (cached or args.formula):
+        start_time = time.time()
+        hard_clauses, soft_clauses_weighted, stats = normalize_formula(hard_clauses, soft_clauses_weighted)
+        print(f"Normalization removed {stats.removed} clauses in {time.time() - start_time:.2f}s "
+              f"({stats.duplicates} duplicates, {stats.tautologies} tautologies, "
+              f"{stats.subsumed} subsumed by units, {stats.soft_merged} soft merged, "
+              f"{stats.soft_satisfied} soft already satisfied)")
+        print(f"Remaining: {len(hard_clauses)} hard and {len(soft_clauses_weighted)} soft clauses")
+    if cache and not (cached or args.formula):
+        cache.store(cache_key, hard_clauses, soft_clauses_weighted, vpool, layout)
+    if args.save_formula:
+        write_formula(args.save_formula, hard_clauses, soft_clauses_weighted, vpool.top)
+        print(f"Saved formula to {args.save_formula}")
+    if args.export:
+        start_time = time.time()
+        print(f"Exporting formula to {args.export}...")
+        try:
+            stats = export_buffers(hard_clauses, soft_clauses_weighted, args.export, args.wcnf_format, vpool.top,
+                                   comment=f"{instance.name} section {mode}")
+        except (ValueError, RuntimeError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        print(f"Wrote {stats.num_hard} hard and {stats.num_soft} soft clauses over {stats.num_vars} variables "
+              f"in {time.time() - start_time:.2f}s.")
+        sys.exit(0)
     print()
     
-    if mode == "3":
-        cost, solving_time = solve_sat(hard_clauses, timeout)
+    # cada mejora reemplaza el .sol, asi siempre hay un horario usable aunque se corte el proceso
+    def write_improvement(improvement):
+        write_solution(args.solution, decode_model(layout, improvement.model))
+    on_improvement = write_improvement if args.solution and layout is not None else None
+
+    phases = None
+    if args.warm_start and layout is not None:
+        from heuristic import warm_start
+        start_time = time.time()
+        assignments, report = warm_start(instance, args.warm_start, mode)
+        phases = assignment_literals(layout, assignments)
+        print(f"Warm start: {report.section_violations(mode)} violations, cost {report.section_cost(mode)} "
+              f"in {time.time() - start_time:.2f}s")
+        if args.solution and report.section_violations(mode) == 0:
+            write_solution(args.solution, assignments)
+    elif args.warm_start:
+        print("Warm start: skipped (no variable layout for --formula)")
+
+    if args.portfolio:
+        result = solve_portfolio(hard_clauses, soft_clauses_weighted, timeout, sat=mode == "3", phases=phases,
+                                 on_improvement=on_improvement)
+    elif mode == "3":
+        result = solve_sat(hard_clauses, timeout, args.conf_budget, args.prop_budget, phases=phases)
+    elif args.maxsat == "lsu":
+        result = solve_maxsat_lsu(hard_clauses, soft_clauses_weighted, timeout, on_improvement=on_improvement,
+                                  phases=phases)
     else:
-        cost, solving_time = solve_maxsat_rc2(hard_clauses, soft_clauses_weighted, timeout)
+        result = solve_maxsat_rc2(hard_clauses, soft_clauses_weighted, timeout, stratified=True, blo=args.blo,
+                                  diversity=args.diversity, thresholds=args.strata,
+                                  on_improvement=on_improvement, phases=phases)
+    cost, solving_time, status = result.cost, result.time, result.status
+    if result.stats:
+        print(f"Solver stats: {', '.join(f'{k}={v}' for k, v in result.stats.items())}")
     
     print(f"\n{'='*70}")
     print(f"RESULTS SUMMARY")
     print(f"{'='*70}")
     print(f"Instance: {instance.name}")
     print(f"Mode: Section {mode}")
-    print(f"Cost: {cost if cost is not None else 'UNSAT'}")
+    relaxed = mode in RELAXED_SECTIONS
+    print(f"Status: {status}" + (" (of the relaxation)" if relaxed and status == OPTIMUM else ""))
+    # el costo que se reporta es el del horario decodificado segun el validador; el de MaxSAT
+    # puede ser mayor al timeout (auxiliares de los totalizers verdaderas sin necesidad) y en
+    # los modos relajados es solo una cota inferior
+    assignments = decode_model(layout, result.model) if result.model is not None and layout is not None else None
+    if assignments is not None:
+        from validator import validate
+        report = validate(instance, assignments)
+        print(f"Cost: {report.section_cost(mode)}")
+        if report.section_violations(mode):
+            print(f"Violations: {report.section_violations(mode)}")
+        if relaxed and cost is not None:
+            print(f"Relaxation cost (lower bound): {cost}")
+        elif cost is not None and cost != report.section_cost(mode):
+            print(f"Solver cost: {cost}")
+    elif relaxed and cost is not None:
+        print(f"Relaxation cost (lower bound): {cost}")
+    else:
+        print(f"Cost: {cost if cost is not None else status}")
+    if status == TIMEOUT and result.lower_bound is not None:
+        print(f"Lower bound: {result.lower_bound}")
+    if args.solution and assignments is not None:
+        write_solution(args.solution, assignments)
+        print(f"Solution: {len(assignments)} lectures written to {args.solution}")
+    elif args.solution:
+        print(f"Solution: not written ({'no model' if result.model is None else 'no variable layout for --formula'})")
     print(f"Encoding time: {encoding_time:.2f}s")
     print(f"Solving time: {solving_time:.2f}s" if solving_time else "N/A")
     print(f"Total time: {encoding_time + (solving_time if solving_time else 0):.2f}s")
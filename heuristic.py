@@ -0,0 +1,227 @@
+"""
+Heuristica constructiva + busqueda tabu para ITC2007 (Curriculum-based Course Timetabling).
+complete_encode.py usa el horario como fases del solver y primer upper bound (--warm-start).
+
+    python heuristic.py data/comp01.ctt [--time 10] [--mode 4.4] [--solution comp01.sol]
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from complete_encode import SECTIONS, parse_ctt, write_solution
+from validator import (
+    CURRICULUM_COMPACTNESS_WEIGHT, MIN_WORKING_DAYS_WEIGHT, ROOM_STABILITY_WEIGHT, TimetableValidator,
+)
+
+# cada violacion hard pesa mas que cualquier costo soft razonable
+HARD_PENALTY = 100000
+# movimientos evaluados por iteracion de la busqueda tabu
+TABU_SAMPLE = 40
+# iteraciones durante las que no se puede volver a poner una clase en la hora que dejo
+TABU_TENURE = 10
+
+def objective(report, mode):
+    return HARD_PENALTY * report.section_violations(mode) + report.section_cost(mode)
+
+class TimetableSearch:
+    """
+    Horario como arreglos (curso, hora, sala) por clase, igual que en
+    TimetableValidator.evaluate_arrays, mas los conflictos y horas disponibles de la instancia
+    """
+    def __init__(self, instance, mode="4.4", seed=0):
+        if mode not in SECTIONS:
+            raise ValueError(f"Unknown mode: {mode}")
+        self.validator = TimetableValidator(instance)
+        self.mode = mode
+        self.rng = np.random.default_rng(seed)
+        v = self.validator
+        self.num_courses, self.num_rooms = len(v.course_ids), len(v.room_ids)
+        self.conflict = (v.conflict + v.conflict.T) > 0
+        self.available = ~v.unavailable
+        self.course_curricula = [np.flatnonzero(v.membership[:, ci]) for ci in range(self.num_courses)]
+        self.hour_day = np.arange(v.num_hours) // v.ppd
+
+    def assignments(self, ci, h, ri):
+        """Arreglos (curso, hora, sala) -> [(curso, dia, periodo, sala), ...] ordenados por curso y hora"""
+        v = self.validator
+        order = np.lexsort((h, ci))
+        return [(v.course_ids[c], hour // v.ppd, hour % v.ppd, v.room_ids[r])
+                for c, hour, r in zip(ci[order].tolist(), h[order].tolist(), ri[order].tolist())]
+
+    def evaluate(self, ci, h, ri):
+        return objective(self.validator.evaluate_arrays(ci, h, ri), self.mode)
+
+    def construct(self):
+        """
+        Greedy: ubica primero las clases del curso con menos horas factibles, siempre en una sala
+        libre; sin hora factible usa la hora con sala libre que menos violaciones hard agrega
+        """
+        v = self.validator
+        course_hour = np.zeros((self.num_courses, v.num_hours), dtype=np.int64)
+        room_hour = np.zeros((self.num_rooms, v.num_hours), dtype=bool)
+        curriculum_hour = np.zeros((len(v.membership), v.num_hours), dtype=np.int64)
+        course_rooms = np.zeros((self.num_courses, self.num_rooms), dtype=bool)
+        remaining = v.num_lectures.copy()
+        lectures = []
+
+        while remaining.any():
+            free_room = ~room_hour.all(axis=0)
+            if not free_room.any():
+                # todas las salas ocupadas en todas las horas: las clases que faltan quedan sin
+                # ubicar, porque cualquier sala que se les de estaria ocupada
+                break
+            scheduled = course_hour > 0
+            blocked = (self.conflict.astype(np.int64) @ scheduled) > 0
+            feasible = self.available & ~scheduled & ~blocked & free_room[None, :]
+            counts = np.where(remaining > 0, feasible.sum(axis=1), np.iinfo(np.int64).max)
+            # menos horas factibles primero; a igual numero, el que tiene mas clases pendientes
+            ci = int(np.lexsort((-remaining, counts))[0])
+
+            hours = np.flatnonzero(feasible[ci])
+            if len(hours) == 0:
+                hours = np.flatnonzero(free_room)
+                violations = (~self.available[ci, hours]).astype(np.int64) + course_hour[ci, hours] + \
+                    (self.conflict[ci].astype(np.int64) @ course_hour[:, hours])
+                hours = hours[violations == violations.min()]
+            h = self.pick_hour(ci, hours, scheduled, curriculum_hour)
+            ri = self.pick_room(ci, h, room_hour, course_rooms)
+
+            course_hour[ci, h] += 1
+            room_hour[ri, h] = True
+            curriculum_hour[self.course_curricula[ci], h] += 1
+            course_rooms[ci, ri] = True
+            remaining[ci] -= 1
+            lectures.append((ci, h, ri))
+
+        lectures = np.array(lectures, dtype=np.int64).reshape(-1, 3)
+        return lectures[:, 0].copy(), lectures[:, 1].copy(), lectures[:, 2].copy()
+
+    def pick_hour(self, ci, hours, scheduled, curriculum_hour):
+        v = self.validator
+        days_used = np.zeros(v.num_days, dtype=bool)
+        days_used[self.hour_day[scheduled[ci]]] = True
+        score = np.zeros(len(hours), dtype=np.int64)
+        if days_used.sum() < v.min_working_days[ci]:
+            score -= MIN_WORKING_DAYS_WEIGHT * ~days_used[self.hour_day[hours]]
+        curricula = self.course_curricula[ci]
+        if len(curricula):
+            busy = curriculum_hour[curricula] > 0
+            period = hours % v.ppd
+            before = np.where(period > 0, busy[:, np.maximum(hours - 1, 0)], False)
+            after = np.where(period < v.ppd - 1, busy[:, np.minimum(hours + 1, v.num_hours - 1)], False)
+            score -= CURRICULUM_COMPACTNESS_WEIGHT * (before | after).sum(axis=0)
+        best = hours[score == score.min()]
+        return int(self.rng.choice(best))
+
+    def pick_room(self, ci, h, room_hour, course_rooms):
+        """Sala libre en h: capacidad que falta + room stability, desempate por la mas chica"""
+        v = self.validator
+        rooms = np.flatnonzero(~room_hour[:, h])
+        overflow = (v.students[ci] - v.capacity[rooms]).clip(min=0)
+        unstable = ROOM_STABILITY_WEIGHT * (course_rooms[ci].any() & ~course_rooms[ci, rooms])
+        return int(rooms[np.lexsort((v.capacity[rooms], overflow + unstable))[0]])
+
+    def conflicting(self, ci, h, ri):
+        """Mascara de las clases involucradas en alguna violacion hard"""
+        v = self.validator
+        course_hour = np.zeros((self.num_courses, v.num_hours), dtype=np.int64)
+        np.add.at(course_hour, (ci, h), 1)
+        room_hour = np.zeros((self.num_rooms, v.num_hours), dtype=np.int64)
+        np.add.at(room_hour, (ri, h), 1)
+        clash = (self.conflict.astype(np.int64) @ (course_hour > 0)) > 0
+        return (course_hour[ci, h] > 1) | clash[ci, h] | ~self.available[ci, h] | (room_hour[ri, h] > 1)
+
+    def tabu_search(self, ci, h, ri, time_limit=10, sample=TABU_SAMPLE, tenure=TABU_TENURE):
+        """
+        Mueve una clase a otra (hora, sala), o la intercambia con la que la ocupa, aplicando el
+        mejor de sample movimientos no tabu. Retorna los arreglos del mejor horario y su objetivo
+        """
+        deadline = time.time() + time_limit
+        current = self.evaluate(ci, h, ri)
+        # clase que ocupa cada (sala, hora); mover a una sala ocupada intercambia las dos clases,
+        # asi ninguna sala queda con dos clases a la vez
+        slot = np.full((self.num_rooms, self.validator.num_hours), -1, dtype=np.int64)
+        slot[ri, h] = np.arange(len(ci))
+        best = (current, ci.copy(), h.copy(), ri.copy())
+        tabu = {}
+        iteration = 0
+        while time.time() < deadline and best[0] > 0 and len(ci):
+            iteration += 1
+            candidates = np.flatnonzero(self.conflicting(ci, h, ri)) if current >= HARD_PENALTY else None
+            if candidates is None or len(candidates) == 0:
+                candidates = np.arange(len(ci))
+
+            chosen = None
+            for _ in range(sample):
+                i = int(self.rng.choice(candidates))
+                hours = np.flatnonzero(self.available[ci[i]])
+                new_h = int(self.rng.choice(hours)) if len(hours) else int(h[i])
+                new_r = int(ri[i]) if self.rng.random() < 0.5 else int(self.rng.integers(self.num_rooms))
+                if new_h == h[i] and new_r == ri[i]:
+                    continue
+                j = int(slot[new_r, new_h])
+                moved = [i] if j < 0 else [i, j]
+                old = h[moved].copy(), ri[moved].copy()
+                h[i], ri[i] = new_h, new_r
+                if j >= 0:
+                    h[j], ri[j] = old[0][0], old[1][0]
+                value = self.evaluate(ci, h, ri)
+                h[moved], ri[moved] = old
+                allowed = tabu.get((i, new_h), 0) < iteration or value < best[0]
+                if allowed and (chosen is None or value < chosen[0]):
+                    chosen = (value, i, j, new_h, new_r)
+            if chosen is None:
+                continue
+
+            current, i, j, new_h, new_r = chosen
+            tabu[(i, int(h[i]))] = iteration + tenure
+            if j >= 0:
+                tabu[(j, new_h)] = iteration + tenure
+                h[j], ri[j] = h[i], ri[i]
+                slot[ri[j], h[j]] = j
+            else:
+                slot[ri[i], h[i]] = -1
+            h[i], ri[i] = new_h, new_r
+            slot[new_r, new_h] = i
+            if current < best[0]:
+                best = (current, ci.copy(), h.copy(), ri.copy())
+        return best[1], best[2], best[3], best[0]
+
+def warm_start(instance, time_limit=10, mode="4.4", seed=0):
+    """
+    Horario inicial: construccion greedy y busqueda tabu por lo que quede de time_limit.
+    Retorna ([(curso, dia, periodo, sala), ...], ValidationReport).
+    """
+    start_time = time.time()
+    search = TimetableSearch(instance, mode, seed)
+    ci, h, ri = search.construct()
+    ci, h, ri, _ = search.tabu_search(ci, h, ri, max(0, time_limit - (time.time() - start_time)))
+    return search.assignments(ci, h, ri), search.validator.evaluate_arrays(ci, h, ri)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Build an ITC2007 timetable with a greedy + tabu search heuristic")
+    parser.add_argument("input_file", help="instance file in ITC2007 .ctt format")
+    parser.add_argument("--time", type=float, default=10, help="time limit in seconds (default: 10)")
+    parser.add_argument("--mode", choices=list(SECTIONS), default="4.4",
+                        help="optimize the soft constraints of this section (default: 4.4)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    parser.add_argument("--solution", metavar="FILE", help="write the timetable to FILE in ITC2007 .sol format")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    instance = parse_ctt(args.input_file)
+    start_time = time.time()
+    assignments, report = warm_start(instance, args.time, args.mode, args.seed)
+    print(f"Timetable: {len(assignments)} lectures in {time.time() - start_time:.2f}s")
+    print(f"Total violations: {report.hard_violations}")
+    print(f"Section {args.mode} violations: {report.section_violations(args.mode)}")
+    print(f"Section {args.mode} cost: {report.section_cost(args.mode)}")
+    print(f"Total cost: {report.soft_cost}")
+    if args.solution:
+        write_solution(args.solution, assignments)
+        print(f"Solution written to {args.solution}")
+    sys.exit(0 if report.feasible else 2)
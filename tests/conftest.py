@@ -0,0 +1,53 @@
+"""
+Instancias ITC2007 chicas y aleatorias para los tests: pocas clases, dos o tres salas y
+pocas horas, asi RC2 llega al optimo en milisegundos y se pueden recorrer decenas de ellas.
+"""
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from complete_encode import parse_ctt
+
+def random_ctt(seed, capacities=None):
+    """
+    Texto .ctt de una instancia aleatoria. Con capacities las salas toman solo esos
+    valores (p.ej. dos capacidades para que haya pocas clases de salas).
+    """
+    rnd = random.Random(seed)
+    num_courses, num_rooms = rnd.randint(3, 6), rnd.randint(2, 3)
+    num_days, ppd = rnd.randint(3, 4), rnd.randint(3, 4)
+    teachers = [f"t{i}" for i in range(rnd.randint(2, num_courses))]
+    courses = []
+    for i in range(num_courses):
+        lectures = rnd.randint(1, 3)
+        courses.append((f"c{i}", rnd.choice(teachers), lectures, rnd.randint(1, min(lectures, num_days)),
+                        rnd.randint(10, 60)))
+    rooms = [(f"r{i}", rnd.choice(capacities) if capacities else rnd.randint(20, 70)) for i in range(num_rooms)]
+    curricula = [(f"k{k}", rnd.sample([c[0] for c in courses], rnd.randint(1, min(4, num_courses))))
+                 for k in range(rnd.randint(1, 3))]
+    unavailable = sorted({(rnd.choice(courses)[0], rnd.randrange(num_days), rnd.randrange(ppd))
+                          for _ in range(rnd.randint(0, num_courses * num_days * ppd // 5))})
+
+    lines = [f"Name: R{seed}", f"Courses: {num_courses}", f"Rooms: {num_rooms}", f"Days: {num_days}",
+             f"Periods_per_day: {ppd}", f"Curricula: {len(curricula)}", f"Constraints: {len(unavailable)}",
+             "", "COURSES:"]
+    lines += [" ".join(map(str, course)) for course in courses]
+    lines += ["", "ROOMS:"] + [" ".join(map(str, room)) for room in rooms]
+    lines += ["", "CURRICULA:"] + [f"{k} {len(members)} {' '.join(members)}" for k, members in curricula]
+    lines += ["", "UNAVAILABILITY_CONSTRAINTS:"] + [" ".join(map(str, u)) for u in unavailable]
+    lines += ["", "END."]
+    return "\n".join(lines) + "\n"
+
+@pytest.fixture
+def make_instance(tmp_path):
+    """make_instance(seed, capacities=None) -> Instance leida con parse_ctt"""
+    def make(seed, capacities=None):
+        path = tmp_path / f"r{seed}.ctt"
+        path.write_text(random_ctt(seed, capacities))
+        return parse_ctt(str(path))
+    return make
@@ -0,0 +1,41 @@
+"""
+batch_runner: una corrida chica de punta a punta, con los resultados escritos a CSV y JSON.
+"""
+
+import csv
+import json
+
+from batch_runner import ERROR, ResultWriter, run_batch
+from complete_encode import OPTIMUM, SAT, UNSAT, encode_section, parse_ctt, solve_maxsat_rc2
+from conftest import random_ctt
+
+def test_run_batch(tmp_path):
+    paths = []
+    for seed in range(2):
+        path = tmp_path / f"r{seed}.ctt"
+        path.write_text(random_ctt(seed))
+        paths.append(str(path))
+    paths.append(str(tmp_path / "missing.ctt"))
+
+    writer = ResultWriter(tmp_path / "out.csv", tmp_path / "out.jsonl")
+    try:
+        rows = run_batch(paths, ["3", "4.4"], timeout=30, jobs=2, writer=writer)
+    finally:
+        writer.close()
+
+    assert len(rows) == 6
+    with open(tmp_path / "out.csv", newline="") as f:
+        assert len(list(csv.DictReader(f))) == 6
+    with open(tmp_path / "out.jsonl") as f:
+        assert [json.loads(line) for line in f] == rows
+
+    results = {(row["instance"], row["mode"]): row for row in rows}
+    for path in paths[:2]:
+        name = path.rsplit("/", 1)[-1]
+        assert results[(name, "3")]["status"] in (SAT, UNSAT)
+        expected = solve_maxsat_rc2(*encode_section("4.4", parse_ctt(path))[:2], timeout=30)
+        assert (results[(name, "4.4")]["status"], results[(name, "4.4")]["cost"]) == (expected.status, expected.cost)
+        assert expected.status == OPTIMUM
+    for mode in ("3", "4.4"):
+        row = results[("missing.ctt", mode)]
+        assert row["status"] == ERROR and "FileNotFoundError" in row["error"]
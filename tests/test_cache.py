@@ -0,0 +1,67 @@
+"""
+EncodingCache: aciertos, fallos y eliminacion de las entradas menos usadas.
+"""
+
+import os
+import time
+
+import numpy as np
+
+from complete_encode import EncodingCache, encode_with_layout, parse_ctt
+from conftest import random_ctt
+
+def same_clauses(a, b):
+    return all(np.array_equal(x, y) for x, y in zip(a.arrays(), b.arrays()) if x is not None or y is not None)
+
+def store_instance(cache, tmp_path, seed, mode="4.4"):
+    path = tmp_path / f"r{seed}.ctt"
+    path.write_text(random_ctt(seed))
+    key = cache.key(str(path), mode)
+    encoded = encode_with_layout(mode, parse_ctt(str(path)))
+    cache.store(key, *encoded)
+    return key, encoded
+
+def test_hit_and_miss(tmp_path):
+    cache = EncodingCache(str(tmp_path / "cache"))
+    key, (hard_clauses, soft_clauses_weighted, vpool, layout) = store_instance(cache, tmp_path, 0)
+    path = str(tmp_path / "r0.ctt")
+    assert cache.load(cache.key(path, "4.2")) is None
+    assert cache.key(path, "4.4", clash_encoding="ladder") != key
+    assert cache.key(path, "4.4", normalized=True) != key
+
+    copy = tmp_path / "copy.ctt"
+    copy.write_bytes((tmp_path / "r0.ctt").read_bytes())
+    assert cache.key(str(copy), "4.4") == key
+    hard_read, soft_read, vpool_read, layout_read = cache.load(key)
+    assert same_clauses(hard_read, hard_clauses) and same_clauses(soft_read, soft_clauses_weighted)
+    assert vpool_read.top == vpool.top
+    assert np.array_equal(layout_read.chr, layout.chr)
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = EncodingCache(str(tmp_path / "cache"))
+    keys = [store_instance(cache, tmp_path, seed)[0] for seed in range(2)]
+    cache.max_bytes = sum(size for _, size, _ in cache.entries()) + 1
+    time.sleep(0.01)
+    assert cache.load(keys[0]) is not None
+    time.sleep(0.01)
+    keys.append(store_instance(cache, tmp_path, 2)[0])
+    assert cache.load(keys[1]) is None
+    assert cache.load(keys[0]) is not None and cache.load(keys[2]) is not None
+
+def test_keeps_entry_larger_than_limit(tmp_path):
+    cache = EncodingCache(str(tmp_path / "cache"), max_bytes=1)
+    first = store_instance(cache, tmp_path, 0)[0]
+    second = store_instance(cache, tmp_path, 1)[0]
+    assert cache.load(first) is None
+    assert cache.load(second) is not None
+
+def test_replaces_incomplete_entry(tmp_path):
+    cache = EncodingCache(str(tmp_path / "cache"))
+    path = tmp_path / "r0.ctt"
+    path.write_text(random_ctt(0))
+    leftover = os.path.join(cache.directory, cache.key(str(path), "4.4"))
+    os.makedirs(leftover)
+    open(os.path.join(leftover, "layout.pkl"), "wb").close()
+    assert cache.load(cache.key(str(path), "4.4")) is None
+    key = store_instance(cache, tmp_path, 0)[0]
+    assert cache.load(key) is not None
@@ -0,0 +1,21 @@
+"""
+Codificaciones de curriculum + teacher clashes: cualquier valor de CLASH_ENCODINGS tiene
+que llegar al mismo optimo que las clausulas binarias originales.
+"""
+
+import pytest
+
+from complete_encode import CLASH_ENCODINGS, encode_section, solve_maxsat_rc2
+
+SEEDS = range(10)
+
+def optimum(hard_clauses, soft_clauses_weighted):
+    result = solve_maxsat_rc2(hard_clauses, soft_clauses_weighted, timeout=60)
+    return result.status, result.cost
+
+@pytest.mark.parametrize("clash_encoding", CLASH_ENCODINGS[1:])
+def test_clash_encodings_keep_optimum(make_instance, clash_encoding):
+    for seed in SEEDS:
+        instance = make_instance(seed)
+        pairwise = optimum(*encode_section("4.4", instance)[:2])
+        assert optimum(*encode_section("4.4", instance, clash_encoding=clash_encoding)[:2]) == pairwise, seed
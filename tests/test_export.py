@@ -0,0 +1,48 @@
+"""
+export_formula: el header DIMACS tiene que coincidir con lo escrito y al
+leer el archivo con pysat se tiene que recuperar la misma formula, con o sin compresion.
+"""
+
+import gzip
+
+import pytest
+from pysat.formula import CNF, WCNF
+
+from complete_encode import encode_section, export_formula
+
+def header(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as f:
+        return next(line.split()[1:] for line in f if line.startswith("p "))
+
+@pytest.mark.parametrize("suffix", [".cnf", ".cnf.gz"])
+def test_cnf_round_trip(make_instance, tmp_path, suffix):
+    instance = make_instance(0)
+    hard_clauses, _, vpool = encode_section("3", instance)
+    path = str(tmp_path / f"r0{suffix}")
+    stats = export_formula("3", instance, path)
+    assert (stats.num_vars, stats.num_hard, stats.num_soft) == (vpool.top, len(hard_clauses), 0)
+    assert header(path) == ["cnf", str(vpool.top), str(len(hard_clauses))]
+    assert CNF(from_file=path).clauses == list(hard_clauses)
+
+@pytest.mark.parametrize("suffix", [".wcnf", ".wcnf.gz"])
+@pytest.mark.parametrize("wcnf_format", ["new", "old"])
+def test_wcnf_round_trip(make_instance, tmp_path, suffix, wcnf_format):
+    instance = make_instance(0)
+    hard_clauses, soft_clauses_weighted, vpool = encode_section("4.4", instance)
+    path = str(tmp_path / f"r0{suffix}")
+    stats = export_formula("4.4", instance, path, wcnf_format=wcnf_format)
+    top_weight = 1 + sum(w for w, _ in soft_clauses_weighted)
+    assert (stats.num_vars, stats.num_hard, stats.num_soft) == (vpool.top, len(hard_clauses),
+                                                                len(soft_clauses_weighted))
+    assert stats.top_weight == top_weight
+    assert stats.passes == (2 if wcnf_format == "old" else 1)
+    if wcnf_format == "old":
+        assert header(path) == ["wcnf", str(vpool.top), str(stats.num_hard + stats.num_soft), str(top_weight)]
+    formula = WCNF(from_file=path)
+    assert formula.hard == list(hard_clauses)
+    assert list(zip(formula.wght, formula.soft)) == list(soft_clauses_weighted)
+
+def test_cnf_rejects_soft_clauses(make_instance, tmp_path):
+    with pytest.raises(ValueError, match="wcnf"):
+        export_formula("4.4", make_instance(0), str(tmp_path / "r0.cnf"))
@@ -0,0 +1,55 @@
+"""
+Formato binario .ccnf: escribir y leer con mmap tiene que devolver los mismos arreglos, y
+desde ahi se tiene que poder exportar a DIMACS.
+"""
+
+import numpy as np
+import pytest
+from pysat.formula import WCNF
+
+from complete_encode import (
+    HARD, SOFT, FormulaWriter, encode_section, export_buffers, read_formula, write_formula,
+)
+
+def same_clauses(a, b):
+    return all(np.array_equal(x, y) for x, y in zip(a.arrays(), b.arrays()) if x is not None or y is not None)
+
+def test_formula_file_round_trip(make_instance, tmp_path):
+    hard_clauses, soft_clauses_weighted, vpool = encode_section("4.4", make_instance(0))
+    path = tmp_path / "r0.ccnf"
+    write_formula(str(path), hard_clauses, soft_clauses_weighted, vpool.top)
+    hard_read, soft_read, num_vars = read_formula(str(path))
+    assert num_vars == vpool.top
+    assert same_clauses(hard_clauses, hard_read)
+    assert same_clauses(soft_clauses_weighted, soft_read)
+
+def test_writer_by_family(tmp_path):
+    path = str(tmp_path / "f.ccnf")
+    with FormulaWriter(path) as writer:
+        writer.add(HARD, [[1, -2], [3]])
+        writer.add(SOFT, [(4, [2])])
+        writer.add(HARD, [[-1, 2, -3]])
+        writer.add(SOFT, [(1, [-3, 1]), (7, [5])])
+    hard_read, soft_read, num_vars = read_formula(path)
+    assert list(hard_read) == [[1, -2], [3], [-1, 2, -3]]
+    assert list(soft_read) == [(4, [2]), (1, [-3, 1]), (7, [5])]
+    assert num_vars == 5
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "r0.ccnf"
+    path.write_bytes(b"p cnf 1 1\n1 0\n")
+    with pytest.raises(ValueError, match="not a binary formula"):
+        read_formula(str(path))
+
+@pytest.mark.parametrize("wcnf_format", ["new", "old"])
+def test_export_buffers_from_ccnf(make_instance, tmp_path, wcnf_format):
+    hard_clauses, soft_clauses_weighted, vpool = encode_section("4.4", make_instance(0))
+    write_formula(str(tmp_path / "r0.ccnf"), hard_clauses, soft_clauses_weighted, vpool.top)
+    hard_read, soft_read, num_vars = read_formula(str(tmp_path / "r0.ccnf"))
+    path = str(tmp_path / "r0.wcnf.gz")
+    stats = export_buffers(hard_read, soft_read, path, wcnf_format=wcnf_format, num_vars=num_vars)
+    assert (stats.num_vars, stats.num_hard, stats.num_soft) == (vpool.top, len(hard_clauses),
+                                                                len(soft_clauses_weighted))
+    formula = WCNF(from_file=path)
+    assert formula.hard == list(hard_clauses)
+    assert list(zip(formula.wght, formula.soft)) == list(soft_clauses_weighted)
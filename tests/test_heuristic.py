@@ -0,0 +1,36 @@
+"""
+Heuristica: la construccion y la busqueda tabu nunca ponen dos clases en la misma sala y
+hora; si no queda ninguna sala libre en ninguna hora la clase queda sin ubicar.
+"""
+
+from dataclasses import replace
+
+import pytest
+
+from heuristic import TimetableSearch, warm_start
+
+SEEDS = range(10)
+
+@pytest.mark.parametrize("mode", ["3", "4.4"])
+def test_rooms_are_never_double_booked(make_instance, mode):
+    for seed in SEEDS:
+        instance = make_instance(seed)
+        search = TimetableSearch(instance, mode, seed)
+        report = search.validator.evaluate_arrays(*search.construct())
+        assert report.room_occupancy == 0 and report.lectures == 0, seed
+
+        assignments, report = warm_start(instance, 0.2, mode, seed)
+        assert report.room_occupancy == 0 and report.lectures == 0, seed
+        assert len(assignments) == sum(course.num_lectures for course in instance.courses.values()), seed
+        assert len({(d, period, room) for _, d, period, room in assignments}) == len(assignments), seed
+
+def test_lectures_without_free_room_stay_unassigned(make_instance):
+    for seed in SEEDS:
+        instance = make_instance(seed)
+        r_id = next(iter(instance.rooms))
+        instance = replace(instance, rooms={r_id: instance.rooms[r_id]})
+        slots = instance.num_days * instance.periods_per_day
+        lectures = sum(course.num_lectures for course in instance.courses.values())
+        assignments, report = warm_start(instance, 0.2, "4.4", seed)
+        assert report.room_occupancy == 0, seed
+        assert len(assignments) == min(lectures, slots), seed
@@ -0,0 +1,95 @@
+"""
+IncrementalTimetable: despues de cada edicion el resultado tiene que ser el de resolver la
+instancia editada desde cero, aunque una llamada anterior se haya interrumpido.
+"""
+
+from dataclasses import replace
+
+import pytest
+
+from complete_encode import (
+    OPTIMUM, SAT, TIMEOUT, UNSAT, IncrementalTimetable, Unavailability, encode_section, solve_maxsat_rc2,
+)
+from validator import validate
+
+def test_edit_interrupt_solve(make_instance):
+    instance = make_instance(0)
+    timetable = IncrementalTimetable(instance, mode="4.4")
+    try:
+        assert timetable.solve(timeout=30).status == OPTIMUM
+        for _ in range(3):
+            # cierra una hora que usa el horario actual: el modelo anterior deja de ser factible
+            c_id, d, p, _ = timetable.assignments()[0]
+            instance = replace(instance, unavailabilities=instance.unavailabilities + [Unavailability(c_id, d, p)])
+            timetable.update(instance)
+
+            interrupted = timetable.solve(timeout=1e-9)
+            assert interrupted.status in (TIMEOUT, OPTIMUM)
+            if interrupted.model is not None:
+                assert validate(instance, timetable.assignments(interrupted.model)).section_violations("4.4") == 0
+
+            result = timetable.solve(timeout=30)
+            fresh = solve_maxsat_rc2(*encode_section("4.4", instance)[:2], timeout=30)
+            assert (result.status, result.cost) == (fresh.status, fresh.cost)
+            report = validate(instance, timetable.assignments())
+            assert report.section_violations("4.4") == 0
+            assert report.section_cost("4.4") == result.cost
+    finally:
+        timetable.delete()
+
+def test_hypothesis_out_of_range(make_instance):
+    instance = make_instance(0)
+    timetable = IncrementalTimetable(instance, mode="3")
+    try:
+        c_id, r_id = next(iter(instance.courses)), next(iter(instance.rooms))
+        for key in [("unavailable", c_id, -1, 0), ("unavailable", c_id, instance.num_days, 0),
+                    ("unavailable", c_id, 0, -1), ("unavailable", c_id, 0, instance.periods_per_day),
+                    ("room_closed", r_id, -1), ("room_closed", r_id, instance.num_days)]:
+            with pytest.raises(ValueError, match="out of range"):
+                timetable.query([key])
+        assert timetable.query([("room_closed", r_id, instance.num_days - 1)]).status in (SAT, UNSAT)
+    finally:
+        timetable.delete()
+
+def test_query_core_is_minimal(make_instance):
+    instance = make_instance(7)
+    timetable = IncrementalTimetable(instance, mode="3")
+    try:
+        assert timetable.query().status == SAT
+        c_id = max(instance.courses, key=lambda c: instance.courses[c].num_lectures)
+        closed = [("unavailable", c_id, d, p) for d in range(instance.num_days)
+                  for p in range(instance.periods_per_day)]
+        full = timetable.query(closed, minimize=False)
+        assert full.status == UNSAT
+        assert set(full.core) <= set(closed) | set(timetable.groups)
+
+        result = timetable.query(closed)
+        assert result.status == UNSAT
+        assert set(result.core) <= set(full.core)
+        groups = set(timetable.groups)
+        for key in result.core:
+            rest = [k for k in result.core if k != key]
+            check = timetable.query([k for k in rest if k not in groups], without=groups - set(rest))
+            assert check.status == SAT, key
+        # las preguntas no cambian el horario
+        assert timetable.solve(timeout=30).status == SAT
+    finally:
+        timetable.delete()
+
+def test_minimize_core_drops_unneeded_selectors(make_instance):
+    instance = make_instance(7)
+    timetable = IncrementalTimetable(instance, mode="3")
+    try:
+        c_id = next(iter(instance.courses))
+        closed = [("unavailable", c_id, d, p) for d in range(instance.num_days)
+                  for p in range(instance.periods_per_day)]
+        selectors = [timetable.hypothesis(key).selector for key in closed]
+        extra = timetable.hypothesis(("room_closed", next(iter(instance.rooms)), 0)).selector
+        core = timetable.minimize_core(selectors + [extra])
+        assert extra not in core
+        assert set(core) <= set(selectors)
+        assert timetable.solve_sat(core).status == UNSAT
+        for selector in core:
+            assert timetable.solve_sat([s for s in core if s != selector]).status == SAT, selector
+    finally:
+        timetable.delete()
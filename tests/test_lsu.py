@@ -0,0 +1,37 @@
+"""
+LSU: el optimo tiene que ser el de RC2, y el weighted_counter que acota el costo tiene que
+forzar su salida b exactamente cuando la suma de los pesos verdaderos pasa b.
+"""
+
+import itertools
+import random
+
+import pytest
+from pysat.formula import IDPool
+from pysat.solvers import Solver
+
+from complete_encode import encode_section, solve_maxsat_lsu, solve_maxsat_rc2, weighted_counter
+
+SEEDS = range(10)
+
+@pytest.mark.parametrize("mode", ["4.1", "4.2", "4.4"])
+def test_lsu_matches_rc2(make_instance, mode):
+    for seed in SEEDS:
+        hard_clauses, soft_clauses_weighted, _ = encode_section(mode, make_instance(seed))
+        lsu = solve_maxsat_lsu(hard_clauses, soft_clauses_weighted, timeout=60)
+        rc2 = solve_maxsat_rc2(hard_clauses, soft_clauses_weighted, timeout=60)
+        assert (lsu.status, lsu.cost) == (rc2.status, rc2.cost), seed
+
+def test_weighted_counter_is_exact():
+    rnd = random.Random(1)
+    for _ in range(60):
+        n = rnd.randint(1, 5)
+        weights = [rnd.randint(1, 6) for _ in range(n)]
+        bound = rnd.randint(0, 12)
+        clauses, outputs = weighted_counter(list(range(1, n + 1)), weights, bound, IDPool(start_from=n + 1))
+        with Solver(bootstrap_with=list(clauses)) as solver:
+            for values in itertools.product([False, True], repeat=n):
+                assumptions = [i + 1 if v else -(i + 1) for i, v in enumerate(values)]
+                total = sum(w for w, v in zip(weights, values) if v)
+                for b in range(bound + 1):
+                    assert solver.solve(assumptions=assumptions + [-outputs[b]]) == (total <= b)
@@ -0,0 +1,42 @@
+"""
+normalize_formula: cada regla de limpieza sobre formulas chicas armadas a mano, y el mismo
+optimo antes y despues sobre instancias aleatorias.
+"""
+
+import pytest
+
+from complete_encode import ClauseBuffer, encode_with_layout, normalize_formula, solve_maxsat_rc2
+
+SEEDS = range(10)
+
+def buffers(hard, soft):
+    hard_clauses, soft_clauses_weighted = ClauseBuffer(), ClauseBuffer(weighted=True)
+    hard_clauses.extend(hard)
+    soft_clauses_weighted.extend(soft)
+    return hard_clauses, soft_clauses_weighted
+
+def test_normalization_stats():
+    hard_clauses, soft_clauses_weighted = buffers(
+        [[2, 1], [1, 2], [1, 1, 3], [1, -1, 4], [5], [5, 6, 7], [3, 4]],
+        [(2, [7, 6]), (3, [6, 7]), (4, [-5, 5]), (1, [5, 8]), (6, [4, 3]), (1, [9])],
+    )
+    hard, soft, stats = normalize_formula(hard_clauses, soft_clauses_weighted)
+    assert list(hard) == [[1, 2], [1, 3], [5], [3, 4]]
+    assert list(soft) == [(5, [6, 7]), (1, [9])]
+    assert (stats.duplicates, stats.tautologies, stats.subsumed) == (1, 2, 1)
+    assert (stats.soft_merged, stats.soft_satisfied) == (1, 2)
+    assert stats.removed == 7
+
+def test_units_subsume_only_longer_clauses():
+    hard_clauses, soft_clauses_weighted = buffers([[-1], [-1, 2], [1, 2], [3, -1]], [])
+    hard, _, stats = normalize_formula(hard_clauses, soft_clauses_weighted)
+    assert list(hard) == [[-1], [1, 2]]
+    assert stats.subsumed == 2
+
+@pytest.mark.parametrize("mode", ["4.2", "4.4"])
+def test_normalization_keeps_optimum(make_instance, mode):
+    for seed in SEEDS:
+        hard_clauses, soft_clauses_weighted, _, _ = encode_with_layout(mode, make_instance(seed))
+        before = solve_maxsat_rc2(hard_clauses, soft_clauses_weighted, timeout=60)
+        after = solve_maxsat_rc2(*normalize_formula(hard_clauses, soft_clauses_weighted)[:2], timeout=60)
+        assert (before.status, before.cost) == (after.status, after.cost), seed
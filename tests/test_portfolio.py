@@ -0,0 +1,17 @@
+"""
+Portfolio: las mejoras de cada proceso llegan al proceso principal por la misma cola que
+los resultados.
+"""
+
+from complete_encode import OPTIMUM, SolverConfig, encode_section, solve_portfolio
+
+def test_portfolio_forwards_improvements(make_instance):
+    hard_clauses, soft_clauses_weighted, _ = encode_section("4.4", make_instance(1))
+    improvements = []
+    configs = [SolverConfig("rc2", "g3"), SolverConfig("lsu", "g3", algorithm="lsu")]
+    result = solve_portfolio(hard_clauses, soft_clauses_weighted, timeout=60, configs=configs,
+                             on_improvement=improvements.append)
+    assert result.status == OPTIMUM
+    costs = [improvement.cost for improvement in improvements]
+    assert costs and costs == sorted(set(costs), reverse=True)
+    assert costs[-1] >= result.cost
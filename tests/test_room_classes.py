@@ -0,0 +1,27 @@
+"""
+Modo 4.4c: al agrupar las salas por capacidad room stability se cuenta por clase, asi que
+el optimo es una cota inferior del de 4.4 y del costo del horario que arma assign_rooms.
+"""
+
+from complete_encode import OPTIMUM, decode_model, encode_section, encode_with_layout, solve_maxsat_rc2
+from validator import validate
+
+# 132, 226 y 265: assign_rooms tiene que cambiar de sala dentro de una clase
+SEEDS = list(range(10)) + [132, 226, 265]
+
+def test_room_classes_are_a_relaxation(make_instance):
+    gaps = 0
+    for seed in SEEDS:
+        instance = make_instance(seed, capacities=(30, 60))
+        rooms = solve_maxsat_rc2(*encode_section("4.4", instance)[:2], timeout=60)
+        hard_clauses, soft_clauses_weighted, _, layout = encode_with_layout("4.4c", instance)
+        result = solve_maxsat_rc2(hard_clauses, soft_clauses_weighted, timeout=60)
+        assert result.status == rooms.status, seed
+        if result.status != OPTIMUM:
+            continue
+        assert result.cost <= rooms.cost, seed
+        report = validate(instance, decode_model(layout, result.model))
+        assert report.section_violations("4.4c") == 0, seed
+        assert report.section_cost("4.4c") >= rooms.cost, seed
+        gaps += report.section_cost("4.4c") > result.cost
+    assert gaps > 0
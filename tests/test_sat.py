@@ -0,0 +1,32 @@
+"""
+solve_sat: una corrida detenida por timeout o por budget no tiene que reportarse como UNSAT.
+"""
+
+import pytest
+from pysat.examples.genhard import PHP
+
+from complete_encode import SAT, TIMEOUT, UNKNOWN, UNSAT, ClauseBuffer, solve_sat
+
+def pigeonhole(holes):
+    hard_clauses = ClauseBuffer()
+    hard_clauses.extend(PHP(holes).clauses)
+    return hard_clauses
+
+def test_sat_and_unsat():
+    hard_clauses = ClauseBuffer()
+    hard_clauses.extend([[1, 2], [-1]])
+    result = solve_sat(hard_clauses, timeout=10)
+    assert (result.status, result.cost) == (SAT, 0)
+    assert 2 in result.model
+    assert solve_sat(pigeonhole(3), timeout=10).status == UNSAT
+
+def test_timeout():
+    result = solve_sat(pigeonhole(10), timeout=0.2)
+    assert result.status == TIMEOUT
+    assert result.model is None and result.time < 5
+
+@pytest.mark.parametrize("budget", [dict(conf_budget=100), dict(prop_budget=1000)])
+def test_budget_exhausted_is_unknown(budget):
+    result = solve_sat(pigeonhole(10), timeout=60, **budget)
+    assert result.status == UNKNOWN
+    assert result.model is None
@@ -0,0 +1,38 @@
+"""
+Cada modo contra validator.py: el optimo de RC2 es el costo del horario decodificado y el
+horario no viola ninguna restriccion que el modo exige como hard.
+"""
+
+import pytest
+
+from complete_encode import (
+    OPTIMUM, SAT, UNSAT, decode_model, encode_with_layout, solve_maxsat_rc2, solve_sat,
+)
+from validator import validate
+
+SEEDS = range(12)
+
+@pytest.mark.parametrize("mode", ["4.1", "4.2", "4.4"])
+def test_maxsat_optimum_matches_validator(make_instance, mode):
+    for seed in SEEDS:
+        instance = make_instance(seed)
+        hard_clauses, soft_clauses_weighted, _, layout = encode_with_layout(mode, instance)
+        result = solve_maxsat_rc2(hard_clauses, soft_clauses_weighted, timeout=60)
+        assert result.status in (OPTIMUM, UNSAT), seed
+        if result.status == UNSAT:
+            continue
+        report = validate(instance, decode_model(layout, result.model))
+        assert report.section_violations(mode) == 0, seed
+        assert report.section_cost(mode) == result.cost, seed
+
+def test_sat_model_is_feasible(make_instance):
+    statuses = set()
+    for seed in SEEDS:
+        instance = make_instance(seed)
+        hard_clauses, _, _, layout = encode_with_layout("3", instance)
+        result = solve_sat(hard_clauses, timeout=60)
+        statuses.add(result.status)
+        assert result.status in (SAT, UNSAT), seed
+        if result.status == SAT:
+            assert validate(instance, decode_model(layout, result.model)).section_violations("3") == 0, seed
+    assert SAT in statuses
@@ -0,0 +1,47 @@
+"""
+Decodificacion y archivos .sol: una sala por clase en 4.4 y el formato de ITC2007
+'CourseID RoomID Day Period' que lee validator.py.
+"""
+
+import os
+
+import pytest
+
+import complete_encode
+from complete_encode import (
+    AMO_PAIRWISE_LIMIT, OPTIMUM, decode_model, encode_with_layout, model_values, solve_maxsat_rc2, write_solution,
+)
+from validator import read_solution, validate
+
+SEEDS = range(10)
+
+@pytest.mark.parametrize("pairwise_limit", [1, AMO_PAIRWISE_LIMIT])
+def test_single_room_per_lecture(make_instance, monkeypatch, pairwise_limit):
+    monkeypatch.setattr(complete_encode, "AMO_PAIRWISE_LIMIT", pairwise_limit)
+    for seed in SEEDS:
+        instance = make_instance(seed)
+        hard_clauses, soft_clauses_weighted, _, layout = encode_with_layout("4.4", instance)
+        result = solve_maxsat_rc2(hard_clauses, soft_clauses_weighted, timeout=60)
+        values = model_values(result.model, layout.top)
+        assert (values[layout.chr].sum(axis=2) <= 1).all(), seed
+        report = validate(instance, decode_model(layout, result.model))
+        assert report.section_cost("4.4") == result.cost, seed
+
+def test_write_solution_format(make_instance, tmp_path):
+    instance = make_instance(0)
+    hard_clauses, soft_clauses_weighted, _, layout = encode_with_layout("4.4", instance)
+    result = solve_maxsat_rc2(hard_clauses, soft_clauses_weighted, timeout=60)
+    assert result.status == OPTIMUM
+    assignments = decode_model(layout, result.model)
+    path = tmp_path / "out" / "r0.sol"
+    path.parent.mkdir()
+    write_solution(str(path), assignments)
+
+    assert os.listdir(path.parent) == ["r0.sol"]
+    lines = path.read_text().splitlines()
+    assert len(lines) == sum(course.num_lectures for course in instance.courses.values())
+    for line, (course, d, period, room) in zip(lines, assignments):
+        assert line == f"{course} {room} {d} {period}"
+        assert course in instance.courses and room in instance.rooms
+        assert 0 <= d < instance.num_days and 0 <= period < instance.periods_per_day
+    assert read_solution(str(path)) == assignments
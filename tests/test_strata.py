@@ -0,0 +1,36 @@
+"""
+RC2 estratificado: cualquier configuracion de estratos llega al mismo optimo que RC2 sin
+estratificar, y el ultimo estrato reportado es el del optimo.
+"""
+
+import pytest
+
+from complete_encode import MIN_WORKING_DAYS_WEIGHT, OPTIMUM, encode_section, solve_maxsat_rc2
+
+SEEDS = range(10)
+
+def optimum(hard_clauses, soft_clauses_weighted, **options):
+    result = solve_maxsat_rc2(hard_clauses, soft_clauses_weighted, timeout=60, **options)
+    return result.status, result.cost
+
+@pytest.mark.parametrize("options", [
+    dict(stratified=True),
+    dict(stratified=True, blo="cluster"),
+    dict(stratified=True, diversity=0.5),
+    dict(stratified=True, thresholds=(MIN_WORKING_DAYS_WEIGHT, 2)),
+])
+def test_rc2_configurations_agree(make_instance, options):
+    for seed in SEEDS:
+        formula = encode_section("4.4", make_instance(seed))[:2]
+        assert optimum(*formula, **options) == optimum(*formula), seed
+
+def test_final_stratum_is_reported(make_instance):
+    for seed in SEEDS:
+        hard_clauses, soft_clauses_weighted, _ = encode_section("4.4", make_instance(seed))
+        result = solve_maxsat_rc2(hard_clauses, soft_clauses_weighted, timeout=60, stratified=True,
+                                  thresholds=(MIN_WORKING_DAYS_WEIGHT, 2))
+        assert result.status == OPTIMUM, seed
+        weights = soft_clauses_weighted.arrays()[2]
+        assert result.strata[-1].weight == weights[weights > 0].min(), seed
+        assert result.strata[-1].lower_bound == result.cost, seed
+        assert [s.lower_bound for s in result.strata] == sorted(s.lower_bound for s in result.strata), seed
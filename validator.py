@@ -0,0 +1,210 @@
+"""
+Validador de soluciones ITC2007 (Curriculum-based Course Timetabling): violaciones hard y
+cada componente de la penalizacion soft oficial (UD2) de un horario.
+
+    python validator.py data/comp01.ctt comp01.sol [--mode 4.4]
+"""
+
+import argparse
+import sys
+from dataclasses import dataclass, fields
+
+import numpy as np
+
+from complete_encode import MIN_WORKING_DAYS_WEIGHT, SECTIONS, parse_ctt
+
+# Pesos oficiales de las restricciones soft (MIN_WORKING_DAYS_WEIGHT viene del encoder)
+ROOM_CAPACITY_WEIGHT = 1
+CURRICULUM_COMPACTNESS_WEIGHT = 2
+ROOM_STABILITY_WEIGHT = 1
+
+HARD_COMPONENTS = ("lectures", "conflicts", "availability", "room_occupancy")
+SOFT_COMPONENTS = ("room_capacity", "min_working_days", "curriculum_compactness", "room_stability")
+# componentes que cada modo deja como soft (el resto son hard en ese modo)
+SECTION_SOFT = {
+    "3": (),
+    "4.1": ("curriculum_compactness",),
+    "4.2": ("curriculum_compactness", "min_working_days"),
+    "4.4": SOFT_COMPONENTS,
+    "4.4c": SOFT_COMPONENTS,
+}
+# componentes soft que cada modo codifica como hard (las que no estan en ninguno no se codifican)
+SECTION_HARD = {
+    "3": SOFT_COMPONENTS,
+    "4.1": ("room_capacity", "room_stability"),
+    "4.2": ("room_capacity", "room_stability"),
+    "4.4": (),
+    "4.4c": (),
+}
+
+@dataclass
+class ValidationReport:
+    """Violaciones hard (conteos) y penalizaciones soft (ya multiplicadas por su peso)"""
+    lectures: int = 0
+    conflicts: int = 0
+    availability: int = 0
+    room_occupancy: int = 0
+    room_capacity: int = 0
+    min_working_days: int = 0
+    curriculum_compactness: int = 0
+    room_stability: int = 0
+
+    @property
+    def hard_violations(self):
+        return sum(getattr(self, name) for name in HARD_COMPONENTS)
+
+    @property
+    def soft_cost(self):
+        return sum(getattr(self, name) for name in SOFT_COMPONENTS)
+
+    @property
+    def feasible(self):
+        return self.hard_violations == 0
+
+    def section_cost(self, mode):
+        """Costo comparable con el de un modo: solo las componentes que ese modo deja soft"""
+        return sum(getattr(self, name) for name in SECTION_SOFT[mode])
+
+    def section_violations(self, mode):
+        """Violaciones hard mas las componentes soft que el modo exige como hard"""
+        return self.hard_violations + sum(getattr(self, name) for name in SECTION_HARD[mode])
+
+class TimetableValidator:
+    """
+    Precalcula los arreglos de la instancia para evaluar muchos horarios seguidos, cada uno
+    como tres arreglos paralelos (curso, hora, sala) de posiciones
+    """
+    def __init__(self, instance):
+        self.instance = instance
+        self.course_ids = list(instance.courses)
+        self.room_ids = list(instance.rooms)
+        self.course_pos = {c: i for i, c in enumerate(self.course_ids)}
+        self.room_pos = {r: i for i, r in enumerate(self.room_ids)}
+        self.ppd = instance.periods_per_day
+        self.num_days = instance.num_days
+        self.num_hours = self.ppd * self.num_days
+        courses = instance.courses.values()
+        num_courses = len(self.course_ids)
+
+        self.num_lectures = np.array([c.num_lectures for c in courses], dtype=np.int64)
+        self.min_working_days = np.array([c.min_working_days for c in courses], dtype=np.int64)
+        self.students = np.array([c.num_students for c in courses], dtype=np.int64)
+        self.capacity = np.array([r.capacity for r in instance.rooms.values()], dtype=np.int64)
+
+        self.unavailable = np.zeros((num_courses, self.num_hours), dtype=bool)
+        for u in instance.unavailabilities:
+            if u.course_id in self.course_pos:
+                self.unavailable[self.course_pos[u.course_id], u.day * self.ppd + u.day_period] = True
+
+        # membresia curriculum x curso y pares de cursos en conflicto (curriculum o profesor, i < j)
+        self.membership = np.zeros((len(instance.curricula), num_courses), dtype=np.int64)
+        for ki, curr in enumerate(instance.curricula.values()):
+            self.membership[ki, [self.course_pos[c] for c in curr.courses if c in self.course_pos]] = 1
+        teachers = np.array([c.teacher for c in courses])
+        conflict = (self.membership.T @ self.membership > 0) | (teachers[:, None] == teachers[None, :])
+        self.conflict = np.triu(conflict, 1).astype(np.int64)
+
+        hours = np.arange(self.num_hours)
+        self.first_of_day = hours % self.ppd == 0
+        self.last_of_day = hours % self.ppd == self.ppd - 1
+
+    def arrays(self, assignments):
+        """[(curso, dia, periodo, sala), ...] -> (curso, hora, sala) como arreglos de posiciones"""
+        try:
+            ci = np.array([self.course_pos[a[0]] for a in assignments], dtype=np.int64)
+            ri = np.array([self.room_pos[a[3]] for a in assignments], dtype=np.int64)
+        except KeyError as e:
+            raise ValueError(f"Unknown course or room {e.args[0]}") from None
+        days = np.array([a[1] for a in assignments], dtype=np.int64)
+        periods = np.array([a[2] for a in assignments], dtype=np.int64)
+        if ((days < 0) | (days >= self.num_days) | (periods < 0) | (periods >= self.ppd)).any():
+            raise ValueError("Lecture scheduled outside the instance's days/periods")
+        return ci, days * self.ppd + periods, ri
+
+    def evaluate(self, assignments):
+        return self.evaluate_arrays(*self.arrays(assignments))
+
+    def evaluate_arrays(self, ci, h, ri):
+        """ValidationReport de un horario dado como arreglos (curso, hora, sala)"""
+        num_courses, num_rooms = len(self.course_ids), len(self.room_ids)
+        course_hour = np.zeros((num_courses, self.num_hours), dtype=np.int64)
+        np.add.at(course_hour, (ci, h), 1)
+        room_hour = np.zeros((num_rooms, self.num_hours), dtype=np.int64)
+        np.add.at(room_hour, (ri, h), 1)
+        course_room = np.zeros((num_courses, num_rooms), dtype=bool)
+        course_room[ci, ri] = True
+        scheduled = course_hour > 0
+        report = ValidationReport()
+
+        report.lectures = int(np.abs(course_hour.sum(axis=1) - self.num_lectures).sum())
+        # dos clases del mismo curso en la misma hora tambien son un conflicto
+        pairs = (scheduled.T.astype(np.int64) @ self.conflict) * scheduled.T
+        report.conflicts = int((course_hour - 1).clip(min=0).sum() + pairs.sum())
+        report.availability = int(scheduled[self.unavailable].sum())
+        report.room_occupancy = int((room_hour - 1).clip(min=0).sum())
+
+        report.room_capacity = ROOM_CAPACITY_WEIGHT * int((self.students[ci] - self.capacity[ri]).clip(min=0).sum())
+        days = scheduled.reshape(num_courses, self.num_days, self.ppd).any(axis=2).sum(axis=1)
+        report.min_working_days = MIN_WORKING_DAYS_WEIGHT * int((self.min_working_days - days).clip(min=0).sum())
+
+        # una clase de un curriculum esta aislada si el curriculum no tiene clases en las horas
+        # vecinas del mismo dia; cuenta una vez por cada curriculum del curso
+        curriculum_hour = self.membership @ course_hour
+        busy = curriculum_hour > 0
+        prev = np.zeros_like(busy)
+        prev[:, 1:] = busy[:, :-1]
+        prev[:, self.first_of_day] = False
+        nxt = np.zeros_like(busy)
+        nxt[:, :-1] = busy[:, 1:]
+        nxt[:, self.last_of_day] = False
+        isolated = busy & ~prev & ~nxt
+        report.curriculum_compactness = CURRICULUM_COMPACTNESS_WEIGHT * int(curriculum_hour[isolated].sum())
+
+        rooms_used = course_room.sum(axis=1)
+        report.room_stability = ROOM_STABILITY_WEIGHT * int((rooms_used - 1).clip(min=0).sum())
+        return report
+
+def validate(instance, assignments):
+    """Atajo para evaluar un solo horario"""
+    return TimetableValidator(instance).evaluate(assignments)
+
+def read_solution(path):
+    """Lee un .sol de ITC2007 ('CourseID RoomID Day Period') como [(curso, dia, periodo, sala), ...]"""
+    assignments = []
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            if len(parts) != 4:
+                raise ValueError(f"Malformed solution line: {line.strip()!r}")
+            course, room, d, period = parts
+            assignments.append((course, int(d), int(period), room))
+    return assignments
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Validate an ITC2007 curriculum-based timetable")
+    parser.add_argument("input_file", help="instance file in ITC2007 .ctt format")
+    parser.add_argument("solution_file", help="solution in ITC2007 .sol format")
+    parser.add_argument("--mode", choices=list(SECTIONS), default=None,
+                        help="also report the cost restricted to the soft constraints of this section")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    instance = parse_ctt(args.input_file)
+    try:
+        report = validate(instance, read_solution(args.solution_file))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    for f in fields(report):
+        kind = "hard" if f.name in HARD_COMPONENTS else "soft"
+        label = "Violations" if kind == "hard" else "Cost"
+        print(f"{label} of {f.name} ({kind}): {getattr(report, f.name)}")
+    print(f"Total violations: {report.hard_violations}")
+    print(f"Total cost: {report.soft_cost}")
+    if args.mode:
+        print(f"Section {args.mode} cost: {report.section_cost(args.mode)}")
+    sys.exit(0 if report.feasible else 2)